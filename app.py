@@ -1,6 +1,8 @@
 """VisaFlow AI - Multi-Language Multi-Format Document Assistant"""
 import streamlit as st
 from pathlib import Path
+import hashlib
+import uuid
 import sys
 
 sys.path.append(str(Path(__file__).parent / 'src'))
@@ -96,9 +98,311 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource(show_spinner=False)
+def load_detector(languages, region_method):
+    """Build the detector once per configuration so OCR readers are reused across reruns
+    
+    The detector is shared by all sessions; its near-duplicate index only
+    reuses results within the session that scanned them (see run_scan).
+    """
+    from document_detector_advanced import AdvancedDocumentDetector
+    return AdvancedDocumentDetector(languages=list(languages), region_method=region_method, duplicate_threshold=6)
+
+@st.cache_resource(show_spinner=False)
+def load_previews():
+    """Disk-backed preview store shared by all sessions"""
+    from previews import PreviewStore
+    return PreviewStore()
+
+# Fragments rerun on their own when their widgets change (no-op on older Streamlit)
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda f: f)
+
+MAX_CACHED_SCANS = 5
+
+def get_scan(scan_key):
+    return st.session_state.scan_results.get(scan_key)
+
+def put_scan(scan_key, scan):
+    """Keep the most recent scans per session"""
+    results = st.session_state.scan_results
+    results[scan_key] = scan
+    while len(results) > MAX_CACHED_SCANS:
+        results.pop(next(iter(results)))
+
+def run_scan(temp_path, languages, region_method, preview_col, profile='balanced'):
+    """Run detection, showing each stage (region crop, OCR passes) as it completes"""
+    scan = {'result': None, 'fields': {}, 'trace': None, 'analysis': None}
+    with st.status("🔄 Processing with YOLOv8 + Advanced OCR...", expanded=True) as status:
+        try:
+            from document_detector_advanced import DetectionEvent
+            detector = load_detector(tuple(languages), region_method)
+            
+            for event in detector.detect_document_iter(temp_path, profile=profile,
+                                                       session=st.session_state.session_id,
+                                                       profiling=st.session_state.profile_mode):
+                data = event.data
+                if event.kind == DetectionEvent.REGION and data['image'] is not None:
+                    status.write(f"🎯 Region: {data['method']} ({data['confidence']:.0%})")
+                    if data['method'] != 'full':
+                        from previews import fit
+                        preview_col.image(fit(data['image']), channels="BGR", caption="Detected document region")
+                elif event.kind == DetectionEvent.OCR_PASS:
+                    status.write(f"🔍 OCR pass {data['pass_number']} ({data['label']}): {len(data['text_blocks'])} text blocks")
+                    if data['accepted']:
+                        status.write(" • ".join(b['text'] for b in data['text_blocks'][:8]))
+                elif event.kind == DetectionEvent.DUPLICATE:
+                    status.write(f"♻️ Near-duplicate of an earlier scan (hash distance {data['distance']}) - reusing its OCR")
+                elif event.kind == DetectionEvent.PAGE:
+                    status.write(f"📄 Page {data['page'] + 1} done: {len(data['text_blocks'])} text blocks")
+                elif event.kind == DetectionEvent.DOCUMENT_TYPE:
+                    status.write(f"🗂️ Document type: {data['document_type']} ({data['confidence']:.0%})")
+                elif event.kind == DetectionEvent.FIELDS:
+                    scan['fields'] = data['fields']
+                elif event.kind == DetectionEvent.TIMINGS:
+                    status.write(f"⏱️ Total {data['timings']['total']:.1f}s")
+                elif event.kind == DetectionEvent.RESULT:
+                    scan['result'] = data['result']
+                elif event.kind == DetectionEvent.ERROR:
+                    scan['result'] = {'error': data['error']}
+            
+            status.update(label="✅ Processing complete", state="complete", expanded=False)
+        except Exception as e:
+            import traceback
+            scan['result'] = {'error': f"Error: {str(e)}"}
+            scan['trace'] = traceback.format_exc()
+            status.update(label="❌ Processing failed", state="error")
+    return scan
+
+def render_scan_summary(scan, show_languages=False):
+    """Render detection results from a cached scan"""
+    result = scan['result']
+    if result and 'error' not in result:
+        # Document type
+        doc_type = result['document_type'].replace('_', ' ').title()
+        st.markdown(f'<div class="success-box">✅ Document: <strong>{doc_type}</strong><br>Confidence: {result["type_confidence"]:.1%}</div>', unsafe_allow_html=True)
+        
+        # Region detection
+        if result.get('region_method') == 'classical':
+            st.markdown(f'<div class="info-box">📐 Document Boundary: <strong>{result["region_confidence"]:.1%}</strong> (perspective corrected)</div>', unsafe_allow_html=True)
+        elif result.get('yolo_confidence'):
+            st.markdown(f'<div class="info-box">🎯 YOLO Detection: <strong>{result["yolo_confidence"]:.1%}</strong></div>', unsafe_allow_html=True)
+        
+        if result.get('duplicate_distance') is not None:
+            st.markdown(f'<div class="info-box">♻️ Near-duplicate of an earlier scan (hash distance <strong>{result["duplicate_distance"]}</strong>) - OCR reused</div>', unsafe_allow_html=True)
+        
+        if result.get('pages', 1) > 1:
+            st.markdown(f'<div class="info-box">📄 Multi-page image: <strong>{result["pages"]} pages</strong></div>', unsafe_allow_html=True)
+        
+        if show_languages and result.get('languages'):
+            st.markdown(f'<div class="info-box">🔤 Auto-detected OCR languages: <strong>{", ".join(result["languages"])}</strong></div>', unsafe_allow_html=True)
+        
+        # Metrics
+        col_a, col_b, col_c = st.columns(3)
+        with col_a:
+            st.metric("📊 Text Blocks", result['num_blocks'])
+        with col_b:
+            st.metric("🎯 OCR Confidence", f"{result['avg_ocr_confidence']:.1%}")
+        with col_c:
+            quality = "🟢 Excellent" if result['avg_ocr_confidence'] > 0.7 else "🟡 Good" if result['avg_ocr_confidence'] > 0.5 else "🔴 Low"
+            st.metric("Quality", quality)
+        
+        if result.get('detection_profile'):
+            st.caption(f"🏎️ {result['detection_profile'].title()} profile - {result['timings'].get('total', 0.0):.1f}s total")
+        
+        if result.get('peak_memory_mb'):
+            concurrent = result.get('memory_concurrent_requests', 1)
+            st.caption(f"💾 Peak process RSS: {result['peak_memory_mb']:.0f} MB (+{result['memory_delta_mb']:.0f} MB during this scan"
+                       + (f", shared with {concurrent - 1} concurrent scans)" if concurrent > 1 else ")"))
+        
+        # Extracted fields
+        fields = scan['fields']
+        if fields:
+            st.markdown("### 📋 Extracted Information")
+            for key, value in fields.items():
+                st.markdown(f"**{key.replace('_', ' ').title()}:** `{value}`")
+        
+        # Quality warning
+        if result['avg_ocr_confidence'] < 0.6:
+            st.markdown('<div class="warning-box">⚠️ Low confidence detected<br>Tip: Use higher resolution or better lighting</div>', unsafe_allow_html=True)
+        
+        render_profile(result.get('profile'))
+    elif result:
+        st.error(f"❌ {result['error']}")
+        if scan['trace']:
+            with st.expander("🔧 Debug Info"):
+                st.code(scan['trace'])
+    else:
+        st.error("❌ Processing failed")
+
+def render_profile(profile):
+    """Top hot functions of a profiled request"""
+    if not profile:
+        return
+    with st.expander("🔧 Debug Info"):
+        st.markdown(f"**Profile** `{profile['request_id']}` ({profile['mode']}, {profile['elapsed_s']:.2f}s)")
+        if profile['path']:
+            st.caption(f"Artifact: {profile['path']}" + (" - open in https://www.speedscope.app"
+                                                          if profile['path'].endswith('.json') else ""))
+        st.dataframe([{'function': row['function'], 'location': row['location'], 'calls': row['calls'],
+                       'self (s)': round(row['self_s'], 4), 'total (s)': round(row['total_s'], 4)}
+                      for row in profile['top']], hide_index=True)
+
+@fragment
+def render_text_blocks(text_blocks):
+    with st.expander(f"👁️ View all {len(text_blocks)} text blocks"):
+        for i, block in enumerate(text_blocks[:50], 1):
+            confidence_color = "🟢" if block['confidence'] > 0.7 else "🟡" if block['confidence'] > 0.5 else "🔴"
+            st.markdown(f"{i}. {confidence_color} **{block['text']}** _{block['confidence']:.1%}_")
+        
+        if len(text_blocks) > 50:
+            st.info(f"... and {len(text_blocks) - 50} more blocks")
+        
+        stats = text_blocks.stats()
+        st.caption(f"Confidence mean {stats['mean_confidence']:.1%} • median {stats['p50_confidence']:.1%} • min {stats['min_confidence']:.1%}")
+        try:
+            import io
+            buffer = io.BytesIO()
+            text_blocks.to_parquet(buffer)
+            st.download_button("⬇️ Download text blocks (Parquet)", buffer.getvalue(),
+                               file_name="text_blocks.parquet", mime="application/octet-stream")
+        except ImportError:
+            st.caption("⚠️ Parquet download unavailable - install `pyarrow` (see requirements.txt)")
+
+@fragment
+def render_ai_analysis(scan_key):
+    """Gemini analysis - reruns on its own, reading the cached scan instead of re-detecting"""
+    scan = get_scan(scan_key)
+    col_ai1, col_ai2 = st.columns([1, 3])
+    with col_ai1:
+        analyze_btn = st.button("🚀 Analyze with AI", use_container_width=True)
+    with col_ai2:
+        st.markdown("Get intelligent insights about completeness, validity, and recommendations")
+    
+    if analyze_btn:
+        with st.spinner("🧠 Gemini AI analyzing..."):
+            try:
+                from llm_assistant import VisaAssistant
+                assistant = VisaAssistant(profile_mode=st.session_state.profile_mode)
+                scan['analysis'] = assistant.analyze_document(scan['result'], scan['fields'])
+                scan['prompt_stats'] = assistant.last_prompt_stats
+                scan['analysis_profile'] = assistant.last_profile
+            except Exception as e:
+                st.error(f"❌ AI Error: {str(e)}")
+    
+    if scan.get('analysis'):
+        st.markdown("#### 📊 AI Analysis Report")
+        st.markdown(scan['analysis'])
+        
+        stats = scan['prompt_stats']
+        st.caption(f"🧮 Prompt: {stats['prompt_tokens']}/{stats['token_budget']} tokens "
+                   f"({stats['budget_used']:.0%} of budget) • "
+                   f"{stats['blocks_used']}/{stats['blocks_total']} text blocks sent")
+        if stats.get('overflow_tokens'):
+            st.caption(f"⚠️ Prompt is {stats['overflow_tokens']} tokens over budget (fixed instructions and fields alone exceed it)")
+        render_profile(scan.get('analysis_profile'))
+
+@st.cache_resource(show_spinner=False)
+def load_visa_store():
+    """Shared requirements store and background refresher for all sessions"""
+    from visa_store import VisaRequirementsStore, BackgroundRefresher
+    from llm_assistant import VisaAssistant
+    store = VisaRequirementsStore()
+    return store, BackgroundRefresher(store, VisaAssistant, max_workers=2)
+
+def get_chat_assistant():
+    """One assistant per browser session so conversation memory survives reruns"""
+    if 'chat_assistant' not in st.session_state:
+        from llm_assistant import VisaAssistant
+        st.session_state.chat_assistant = VisaAssistant()
+    st.session_state.chat_assistant.profile_mode = st.session_state.profile_mode
+    return st.session_state.chat_assistant
+
+@st.cache_resource(show_spinner=False)
+def start_metrics_endpoint():
+    """Expose the metrics registry in Prometheus format once per process"""
+    import os
+    from metrics import start_http_server
+    port = int(os.getenv('VISAFLOW_METRICS_PORT', '9464'))
+    try:
+        return start_http_server(port)
+    except OSError as e:
+        print(f"[WARNING] Metrics endpoint not started on port {port}: {e}")
+        return None
+
+@fragment
+def render_metrics_dashboard():
+    """Live view of the in-process metrics registry"""
+    import metrics
+    
+    if st.button("🔄 Refresh metrics"):
+        pass  # Reruns just this fragment
+    
+    documents = metrics.DETECTOR_DOCUMENTS.samples()
+    total = sum(v for _, v in documents)
+    errors = sum(v for key, v in documents if key[2] == 'error')
+    passes = metrics.OCR_PASSES.samples()
+    fallbacks = dict(metrics.OCR_FALLBACKS.samples()).get((), 0)  # Documents, so the rate is at most 100%
+    llm = metrics.LLM_REQUESTS.samples()
+    llm_total = sum(v for _, v in llm)
+    llm_errors = sum(v for key, v in llm if key[2] == 'error')
+    tokens = sum(v for _, v in metrics.LLM_TOKENS.samples())
+    
+    cols = st.columns(4)
+    cols[0].metric("📄 Documents", total, f"{errors / total:.0%} errors" if total else None, delta_color="inverse")
+    cols[1].metric("🔁 OCR Fallback Rate", f"{fallbacks / total:.0%}" if total else "–")
+    cols[2].metric("🤖 LLM Requests", llm_total, f"{llm_errors / llm_total:.0%} errors" if llm_total else None, delta_color="inverse")
+    cols[3].metric("🔤 LLM Tokens", tokens)
+    
+    if not total and not llm_total:
+        st.caption("No requests recorded in this process yet")
+        return
+    
+    col_a, col_b = st.columns(2)
+    with col_a:
+        stage_hist = metrics.DETECTOR_STAGE_SECONDS
+        if stage_hist.samples():
+            st.markdown("**Stage latency (s)**")
+            st.dataframe([{'stage': key[0], 'count': count, 'mean': total_s / count,
+                           'p50 ≤': stage_hist.quantile(0.5, stage=key[0]),
+                           'p95 ≤': stage_hist.quantile(0.95, stage=key[0])}
+                          for key, (_, total_s, count) in sorted(stage_hist.samples())], hide_index=True)
+        if passes:
+            st.markdown("**OCR passes**")
+            st.dataframe([{'pass': key[0], 'accepted': key[1], 'count': v} for key, v in sorted(passes)], hide_index=True)
+    with col_b:
+        mix = {}
+        for key, v in documents:
+            if key[2] == 'success':
+                mix[key[1]] = mix.get(key[1], 0) + v
+        if mix:
+            st.markdown("**Document type mix**")
+            st.bar_chart(mix)
+        confidence = metrics.OCR_CONFIDENCE.samples()
+        if confidence:
+            counts, _, _ = confidence[0][1]
+            st.markdown("**OCR confidence distribution**")
+            st.bar_chart({f"≤{b:.1f}": c for b, c in zip(metrics.OCR_CONFIDENCE.buckets, counts)})
+        if llm_total:
+            llm_hist = metrics.LLM_SECONDS
+            st.markdown("**LLM latency (s)**")
+            st.dataframe([{'operation': key[0], 'backend': key[1], 'count': count, 'mean': total_s / count,
+                           'p95 ≤': llm_hist.quantile(0.95, operation=key[0], backend=key[1])}
+                          for key, (_, total_s, count) in sorted(llm_hist.samples())], hide_index=True)
+    
+    server = start_metrics_endpoint()
+    if server is not None:
+        host, port = server.server_address[:2]
+        st.caption(f"Prometheus endpoint: http://{host}:{port}/metrics")
+
+start_metrics_endpoint()
+
 # Initialize session state
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
+if 'scan_results' not in st.session_state:
+    st.session_state.scan_results = {}
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
 # Header
 st.markdown('<p class="main-header">🌐 VisaFlow AI</p>', unsafe_allow_html=True)
@@ -115,6 +419,19 @@ with st.sidebar:
     
     st.markdown("---")
     
+    # Profiling applies to this session only; VISAFLOW_PROFILE sets the initial mode
+    import profiler
+    profile_labels = {"Off": None, "Sampling (speedscope)": "sample", "cProfile (.prof)": "cprofile"}
+    profile_choice = st.selectbox(
+        "🔬 Request Profiling",
+        list(profile_labels.keys()),
+        index=list(profile_labels.values()).index(profiler.get_mode()),
+        help="Profile this session's scans and LLM calls; artifacts are written to outputs/profiles/"
+    )
+    st.session_state.profile_mode = profile_labels[profile_choice]
+    
+    st.markdown("---")
+    
     # Stats
     st.markdown("### 📈 Platform Stats")
     col1, col2 = st.columns(2)
@@ -155,8 +472,8 @@ if page == "📄 Document Scanner":
     with col_lang1:
         primary_lang = st.selectbox(
             "Primary Language",
-            ["English", "Hindi", "Tamil", "Telugu", "Bengali", "Marathi", "Gujarati", "Kannada"],
-            help="Main language in your document"
+            ["Auto", "English", "Hindi", "Tamil", "Telugu", "Bengali", "Marathi", "Gujarati", "Kannada"],
+            help="Main language in your document - Auto detects the script and loads only the readers it needs"
         )
     
     with col_lang2:
@@ -173,39 +490,78 @@ if page == "📄 Document Scanner":
     # Map languages
     lang_map = {
         "English": "en", "Hindi": "hi", "Tamil": "ta", "Telugu": "te",
-        "Bengali": "bn", "Marathi": "mr", "Gujarati": "gu", "Kannada": "kn", "None": None
+        "Bengali": "bn", "Marathi": "mr", "Gujarati": "gu", "Kannada": "kn", "None": None,
+        "Auto": "auto"
     }
     
     languages = [lang_map[primary_lang]]
-    if lang_map[secondary_lang]:
+    if lang_map[secondary_lang] and primary_lang != "Auto":
         languages.append(lang_map[secondary_lang])
     
+    region_labels = {
+        "Auto (Boundary → YOLO)": "auto",
+        "Document Boundary Only": "classical",
+        "YOLOv8 Only": "yolo"
+    }
+    region_choice = st.selectbox(
+        "🎯 Region Detection",
+        list(region_labels.keys()),
+        help="Boundary detection finds the card/page outline and straightens it; YOLO runs only when no outline is found in Auto mode"
+    )
+    region_method = region_labels[region_choice]
+    
+    profile_labels = {
+        "⚖️ Balanced": "balanced",
+        "⚡ Fast": "fast",
+        "🎯 Accurate": "accurate"
+    }
+    profile_choice = st.selectbox(
+        "🏎️ Speed / Accuracy",
+        list(profile_labels.keys()),
+        help="Fast downscales to 1600 px, skips denoising and orientation correction and runs at most two OCR passes; "
+             "Accurate uses a larger YOLO model, a bigger detection canvas and beam-search decoding"
+    )
+    detection_profile = profile_labels[profile_choice]
+    
     st.markdown("---")
     
     # File upload
     uploaded_file = st.file_uploader(
         "📎 Upload Document (Images, PDF, Word)",
-        type=['jpg', 'jpeg', 'png', 'pdf', 'docx', 'bmp', 'tiff', 'webp'],
+        type=['jpg', 'jpeg', 'png', 'pdf', 'docx', 'bmp', 'tiff', 'tif', 'webp'],
         help="Drag and drop or click to browse"
     )
     
     if uploaded_file:
-        # Save file
+        # Results are keyed by file content + settings, so reruns triggered by
+        # buttons or widgets reuse them instead of running OCR again
+        file_bytes = uploaded_file.getvalue()
         file_ext = Path(uploaded_file.name).suffix
-        temp_path = Path(f"outputs/uploaded_doc{file_ext}")
-        temp_path.parent.mkdir(parents=True, exist_ok=True)
+        file_hash = hashlib.sha256(file_bytes).hexdigest()[:16]
+        scan_key = (file_hash, tuple(languages), region_method, detection_profile)
         
-        with open(temp_path, "wb") as f:
-            f.write(uploaded_file.read())
+        # Private temp storage, purged by age and size - uploads are personal documents
+        from temp_storage import purge, temp_dir, touch
+        temp_path = temp_dir('uploads') / f"{file_hash}{file_ext}"
+        if not temp_path.exists():
+            with open(temp_path, "wb") as f:
+                f.write(file_bytes)
+            purge(temp_path.parent)
+            purge(load_previews().directory)
+        else:
+            touch(temp_path)
         
         # Display area
         col1, col2 = st.columns([1, 1])
         
         with col1:
             st.markdown("### 📥 Uploaded Document")
-            if file_ext in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp']:
-                st.image(str(temp_path))
-            elif file_ext == '.pdf':
+            # Served from a cached display-size preview, never the full-resolution upload
+            try:
+                st.image(str(load_previews().thumbnail(temp_path, file_hash)))
+            except Exception as e:
+                st.caption(f"⚠️ Preview unavailable: {e}")
+            if file_ext == '.pdf':
                 st.markdown(f'<div class="info-box">📄 PDF Document<br><strong>{uploaded_file.name}</strong><br>Size: {uploaded_file.size / 1024:.1f} KB</div>', unsafe_allow_html=True)
             elif file_ext == '.docx':
                 st.markdown(f'<div class="info-box">📝 Word Document<br><strong>{uploaded_file.name}</strong><br>Size: {uploaded_file.size / 1024:.1f} KB</div>', unsafe_allow_html=True)
@@ -213,92 +569,49 @@ if page == "📄 Document Scanner":
         with col2:
             st.markdown("### 🔍 AI Analysis Results")
             
-            with st.spinner("🔄 Processing with YOLOv8 + Advanced OCR..."):
-                result = None
-                try:
-                    from document_detector_advanced import AdvancedDocumentDetector
-                    
-                    detector = AdvancedDocumentDetector(languages=languages)
-                    result = detector.detect_document(temp_path)
-                    
-                    if result and 'error' not in result:
-                        # Document type
-                        doc_type = result['document_type'].replace('_', ' ').title()
-                        st.markdown(f'<div class="success-box">✅ Document: <strong>{doc_type}</strong><br>Confidence: {result["type_confidence"]:.1%}</div>', unsafe_allow_html=True)
-                        
-                        # YOLO detection
-                        if result.get('yolo_confidence'):
-                            st.markdown(f'<div class="info-box">🎯 YOLO Detection: <strong>{result["yolo_confidence"]:.1%}</strong></div>', unsafe_allow_html=True)
-                        
-                        # Metrics
-                        col_a, col_b, col_c = st.columns(3)
-                        with col_a:
-                            st.metric("📊 Text Blocks", result['num_blocks'])
-                        with col_b:
-                            st.metric("🎯 OCR Confidence", f"{result['avg_ocr_confidence']:.1%}")
-                        with col_c:
-                            quality = "🟢 Excellent" if result['avg_ocr_confidence'] > 0.7 else "🟡 Good" if result['avg_ocr_confidence'] > 0.5 else "🔴 Low"
-                            st.metric("Quality", quality)
-                        
-                        # Extracted fields
-                        fields = detector.extract_fields(result)
-                        
-                        if fields:
-                            st.markdown("### 📋 Extracted Information")
-                            for key, value in fields.items():
-                                st.markdown(f"**{key.replace('_', ' ').title()}:** `{value}`")
-                        
-                        # Quality warning
-                        if result['avg_ocr_confidence'] < 0.6:
-                            st.markdown('<div class="warning-box">⚠️ Low confidence detected<br>Tip: Use higher resolution or better lighting</div>', unsafe_allow_html=True)
-                    else:
-                        if result:
-                            st.error(f"❌ {result['error']}")
-                        else:
-                            st.error("❌ Processing failed")
-                        
-                except Exception as e:
-                    st.error(f"❌ Error: {str(e)}")
-                    with st.expander("🔧 Debug Info"):
-                        import traceback
-                        st.code(traceback.format_exc())
+            scan = get_scan(scan_key)
+            if scan is None:
+                scan = run_scan(temp_path, languages, region_method, preview_col=col1, profile=detection_profile)
+                put_scan(scan_key, scan)
+            
+            result = scan['result']
+            render_scan_summary(scan, show_languages=primary_lang == "Auto")
+            
+            detector = load_detector(tuple(languages), region_method)
+            if detector.duplicate_index is not None:
+                dup = detector.duplicate_index.stats()
+                st.caption(f"♻️ Near-duplicate index: {dup['hits']}/{dup['lookups']} hits ({dup['hit_rate']:.0%}), "
+                           f"{dup['entries']} documents, threshold {dup['threshold']} bits, "
+                           f"{dup['rejected']} hash matches rejected by the pixel check")
+            if detector.stage_cache is not None:
+                cache = detector.stage_cache.stats()
+                st.caption(f"🧠 Stage cache: {cache['hits']}/{cache['hits'] + cache['misses']} hits ({cache['hit_rate']:.0%}), "
+                           f"{cache['entries']} artifacts, {cache['mb']:.0f}/{cache['max_mb']:.0f} MB")
+        
+        # Detected region and text boxes drawn on the preview
+        if result and 'error' not in result and file_ext.lower() not in ('.pdf', '.docx'):
+            with col1:
+                if st.checkbox("🔲 Show detected region and text boxes"):
+                    settings_key = hashlib.sha256(repr(scan_key[1:]).encode()).hexdigest()[:8]
+                    try:
+                        overlay = load_previews().overlay(temp_path, result, settings_key, digest=file_hash)
+                        st.image(str(overlay), caption="Green: document region • Orange: text boxes")
+                    except Exception as e:
+                        st.caption(f"⚠️ Overlay unavailable: {e}")
+                    if result.get('duplicate_distance') is not None or result.get('pages', 1) > 1:
+                        st.caption("Boxes are hidden for near-duplicate and multi-page scans - their OCR geometry belongs to another image or page")
         
         # Extracted text section
         if result and 'text_blocks' in result and result['text_blocks']:
             st.markdown("---")
             st.markdown("### 📝 Extracted Text Details")
-            
-            with st.expander(f"👁️ View all {len(result['text_blocks'])} text blocks"):
-                for i, block in enumerate(result['text_blocks'][:50], 1):
-                    confidence_color = "🟢" if block['confidence'] > 0.7 else "🟡" if block['confidence'] > 0.5 else "🔴"
-                    st.markdown(f"{i}. {confidence_color} **{block['text']}** _{block['confidence']:.1%}_")
-                
-                if len(result['text_blocks']) > 50:
-                    st.info(f"... and {len(result['text_blocks']) - 50} more blocks")
+            render_text_blocks(result['text_blocks'])
         
         # AI Analysis
         if result and 'error' not in result:
             st.markdown("---")
             st.markdown("### 🤖 Gemini AI Deep Analysis")
-            
-            col_ai1, col_ai2 = st.columns([1, 3])
-            with col_ai1:
-                analyze_btn = st.button("🚀 Analyze with AI", use_container_width=True)
-            with col_ai2:
-                st.markdown("Get intelligent insights about completeness, validity, and recommendations")
-            
-            if analyze_btn:
-                with st.spinner("🧠 Gemini AI analyzing..."):
-                    try:
-                        from llm_assistant import VisaAssistant
-                        assistant = VisaAssistant()
-                        text_data = {'full_text': result.get('text_blocks', [])}
-                        analysis = assistant.analyze_document(text_data, result.get('document_type', 'document'))
-                        
-                        st.markdown("#### 📊 AI Analysis Report")
-                        st.markdown(analysis)
-                    except Exception as e:
-                        st.error(f"❌ AI Error: {str(e)}")
+            render_ai_analysis(scan_key)
 
 # Page 2: Visa Requirements
 elif page == "🌍 Visa Requirements":
@@ -325,12 +638,27 @@ elif page == "🌍 Visa Requirements":
     if st.button("🔍 Get Requirements", use_container_width=True):
         with st.spinner(f"🔄 Fetching {purpose} visa requirements..."):
             try:
-                from llm_assistant import VisaAssistant
-                assistant = VisaAssistant()
-                requirements = assistant.get_visa_requirements(from_country, to_country, purpose)
+                store, refresher = load_visa_store()
+                store.log_lookup(from_country, to_country, purpose)
+                record = store.get(from_country, to_country, purpose)
                 
                 st.markdown("### 📋 Visa Requirements")
-                st.markdown(requirements)
+                if record:
+                    # Serve instantly from the store; stale entries refresh in the background
+                    st.markdown(record['answer'])
+                    age_hours = record['age_seconds'] / 3600
+                    age_text = f"{age_hours:.0f} h" if age_hours >= 1 else f"{record['age_seconds'] / 60:.0f} min"
+                    if record['stale']:
+                        refresher.refresh(from_country, to_country, purpose)
+                        st.caption(f"🕒 Updated {age_text} ago • refreshing in the background")
+                    else:
+                        st.caption(f"🕒 Updated {age_text} ago")
+                else:
+                    from llm_assistant import VisaAssistant
+                    assistant = VisaAssistant(profile_mode=st.session_state.profile_mode)
+                    answer = st.write_stream(assistant.stream_visa_requirements(from_country, to_country, purpose))
+                    store.put(from_country, to_country, purpose, answer, assistant.backend.name)
+                    render_profile(assistant.last_profile)
                 
                 st.markdown("---")
                 st.markdown("### 💡 Pro Tips")
@@ -378,6 +706,12 @@ elif page == "💬 AI Assistant":
             })
             st.rerun()
     
+    if st.session_state.chat_history and st.button("🗑️ Clear conversation"):
+        st.session_state.chat_history = []
+        if 'chat_assistant' in st.session_state:
+            st.session_state.chat_assistant.reset_conversation()
+        st.rerun()
+    
     st.markdown("---")
     
     # Chat history
@@ -395,8 +729,7 @@ elif page == "💬 AI Assistant":
         with st.chat_message("assistant", avatar="🤖"):
             with st.spinner("🤔 Thinking..."):
                 try:
-                    from llm_assistant import VisaAssistant
-                    assistant = VisaAssistant()
+                    assistant = get_chat_assistant()
                     response = assistant.chat(prompt)
                     st.markdown(response)
                     st.session_state.chat_history.append({"role": "assistant", "content": response})
@@ -529,6 +862,12 @@ elif page == "📊 About":
     
     st.markdown("---")
     
+    # Live diagnostics from the metrics registry
+    st.markdown("### 📈 Live Diagnostics")
+    render_metrics_dashboard()
+    
+    st.markdown("---")
+    
     # Global Impact
     st.markdown("### 🌍 Global Impact")
     
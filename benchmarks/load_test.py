@@ -0,0 +1,305 @@
+"""Load test: concurrent scanner, visa-requirements and chat users against the app's code paths
+
+Usage:
+    python benchmarks/load_test.py --levels 1,2,4,8 --duration 30 --label v1.4
+    python benchmarks/load_test.py --compare outputs/loadtest/v1.3.json outputs/loadtest/v1.4.json
+
+Each virtual user is a thread, as Streamlit serves each session on its own
+thread, and shares one detector as load_detector() does. Users loop over a
+weighted scenario mix:
+    scan          detect_document on a synthetic Aadhaar/passport/PAN photo
+    requirements  store-first lookup, streaming the answer on a miss (as the app page)
+    chat          one chat turn on the user's own VisaAssistant
+The LLM is the local stub server (llm_stub_server.py) replaying recordings,
+or placeholder answers with a synthetic latency model when none are recorded.
+
+Concurrency ramps through --levels. Each level reports throughput,
+p50/p95/p99 latency, error rate, peak RSS and the RSS added per user; the
+capacity curve is written to outputs/loadtest/<label>.json for comparison
+between releases.
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'src'))
+
+from document_detector_advanced import AdvancedDocumentDetector
+from llm_assistant import VisaAssistant
+from llm_backends import DEFAULT_RECORDINGS, ReplayBackend, StubServerBackend
+from llm_stub_server import make_handler
+from memory_monitor import PeakMemoryMonitor
+from visa_store import VisaRequirementsStore
+
+SCENARIOS = ('scan', 'requirements', 'chat')
+
+CORRIDORS = [
+    ('India', 'United States', 'Tourist'), ('India', 'United Kingdom', 'Student'),
+    ('India', 'Canada', 'Work'), ('India', 'Germany', 'Business'), ('India', 'Australia', 'Tourist'),
+    ('India', 'Singapore', 'Transit'), ('India', 'Japan', 'Tourist'), ('India', 'France', 'Student'),
+    ('Nepal', 'India', 'Work'), ('India', 'United Arab Emirates', 'Work'), ('India', 'Thailand', 'Medical'),
+    ('Bangladesh', 'India', 'Medical'),
+]
+
+CHAT_MESSAGES = [
+    "How long does a US tourist visa take?",
+    "Which documents do I need for a UK student visa?",
+    "Can I work part time on a Canadian study permit?",
+    "Is travel insurance mandatory for Schengen visas?",
+    "What bank balance should I show for a visitor visa?",
+    "Do I need a transit visa for a layover in Singapore?",
+]
+
+NAMES = ['RAHUL SHARMA', 'PRIYA NAIR', 'ARJUN MEHTA', 'ANANYA IYER', 'VIKRAM SINGH', 'SNEHA PATEL']
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def synthetic_document(rng, kind):
+    """A rendered ID card photographed at an angle on a darker background"""
+    name = NAMES[rng.integers(len(NAMES))]
+    digits = ''.join(str(d) for d in rng.integers(0, 10, 12))
+    dob = f"{rng.integers(1, 29):02d}/{rng.integers(1, 13):02d}/{rng.integers(1960, 2005)}"
+    letters = ''.join(chr(c) for c in rng.integers(65, 91, 5))
+    lines = {
+        'aadhaar': ["GOVERNMENT OF INDIA", name, f"DOB: {dob}", "MALE", f"{digits[:4]} {digits[4:8]} {digits[8:]}"],
+        'passport': ["REPUBLIC OF INDIA", "PASSPORT", f"Surname: {name.split()[1]}", f"Given Name: {name.split()[0]}",
+                     "Nationality: INDIAN", f"Date of Birth: {dob}",
+                     f"P<IND{name.split()[1]}<<{name.split()[0]}".ljust(36, '<')],
+        'pan': ["INCOME TAX DEPARTMENT", "Permanent Account Number", f"{letters}{digits[:4]}{letters[0]}",
+                name, f"Father's Name: {NAMES[rng.integers(len(NAMES))]}", dob],
+    }[kind]
+
+    card = np.full((560, 880, 3), int(rng.integers(225, 250)), np.uint8)
+    y = 70
+    for line in lines:
+        cv2.putText(card, line, (40, y), cv2.FONT_HERSHEY_SIMPLEX, 1.1, (30, 30, 30), 2, cv2.LINE_AA)
+        y += 70
+
+    h, w = 1200, 1600
+    photo = np.full((h, w, 3), int(rng.integers(40, 120)), np.uint8)
+    corners = np.float32([[0, 0], [880, 0], [880, 560], [0, 560]])
+    target = np.float32([[300, 250], [1300, 230], [1320, 900], [280, 920]]) + rng.uniform(-40, 40, (4, 2)).astype(np.float32)
+    matrix = cv2.getPerspectiveTransform(corners, target)
+    cv2.warpPerspective(card, matrix, (w, h), dst=photo, borderMode=cv2.BORDER_TRANSPARENT)
+    noise = rng.normal(0, 6, photo.shape)
+    return np.clip(photo + noise, 0, 255).astype(np.uint8)
+
+
+def build_corpus(directory, size, seed):
+    rng = np.random.default_rng(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(size):
+        kind = ('aadhaar', 'passport', 'pan')[i % 3]
+        path = directory / f"{kind}_{i:03d}.jpg"
+        cv2.imwrite(str(path), synthetic_document(rng, kind), [cv2.IMWRITE_JPEG_QUALITY, 88])
+        paths.append(path)
+    return paths
+
+
+def start_stub_server(recordings, speed):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(ReplayBackend(recordings, time_scale=speed)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class LoadTest:
+    def __init__(self, detector, corpus, backend_factory, mix, seed=0):
+        self.detector = detector
+        self.corpus = corpus
+        self.backend_factory = backend_factory
+        self.scenarios = [name for name, weight in mix.items() if weight > 0]
+        self.weights = [mix[name] for name in self.scenarios]
+        self.seed = seed
+
+    def run_level(self, users, duration):
+        store = VisaRequirementsStore(Path(tempfile.mkdtemp()) / 'visa_requirements.db')
+        results = []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def user(index):
+            rng = random.Random(self.seed * 1000 + index)
+            assistant = VisaAssistant(backend=self.backend_factory())
+            while time.perf_counter() < deadline:
+                scenario = rng.choices(self.scenarios, self.weights)[0]
+                start = time.perf_counter()
+                error = None
+                try:
+                    self._run(scenario, rng, assistant, store)
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                with lock:
+                    results.append((scenario, time.perf_counter() - start, error))
+
+        started = time.perf_counter()
+        with PeakMemoryMonitor() as memory:
+            threads = [threading.Thread(target=user, args=(i,), name=f'user-{i}') for i in range(users)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        elapsed = time.perf_counter() - started
+        return self._summarize(users, elapsed, results, memory)
+
+    def _run(self, scenario, rng, assistant, store):
+        if scenario == 'scan':
+            # Each simulated user is its own session for the near-duplicate index
+            result = self.detector.detect_document(rng.choice(self.corpus),
+                                                   session=threading.current_thread().name)
+            if 'error' in result:
+                raise RuntimeError(result['error'])
+        elif scenario == 'requirements':
+            corridor = CORRIDORS[min(int(rng.paretovariate(1.2)) - 1, len(CORRIDORS) - 1)]
+            if store.get(*corridor) is None:
+                answer = ''.join(assistant.stream_visa_requirements(*corridor))
+                store.put(*corridor, answer, assistant.backend.name)
+        else:
+            assistant.chat(rng.choice(CHAT_MESSAGES))
+
+    def _summarize(self, users, elapsed, results, memory):
+        def stats(rows):
+            latencies = sorted(latency for _, latency, _ in rows)
+            errors = sum(1 for _, _, error in rows if error)
+            return {
+                'requests': len(rows),
+                'throughput_rps': len(rows) / elapsed if elapsed else 0.0,
+                'p50_s': percentile(latencies, 0.50),
+                'p95_s': percentile(latencies, 0.95),
+                'p99_s': percentile(latencies, 0.99),
+                'error_rate': errors / len(rows) if rows else 0.0,
+            }
+
+        summary = dict(stats(results), users=users, elapsed_s=elapsed,
+                       peak_rss_mb=memory.peak_mb,
+                       rss_per_user_mb=memory.delta_mb / users)
+        summary['scenarios'] = {name: stats([r for r in results if r[0] == name]) for name in self.scenarios}
+        errors = sorted({error for _, _, error in results if error})
+        summary['errors'] = errors[:5]
+        return summary
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r} (choose from {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def fmt(seconds):
+    return f"{seconds:.2f}" if seconds is not None else "-"
+
+
+def print_curve(label, levels):
+    print(f"\n{label}")
+    print(f"{'users':>5} {'req':>6} {'req/s':>7} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'errors':>7} {'RSS MB':>7} {'MB/user':>8}")
+    for r in levels:
+        print(f"{r['users']:>5} {r['requests']:>6} {r['throughput_rps']:>7.2f} {fmt(r['p50_s']):>7} "
+              f"{fmt(r['p95_s']):>7} {fmt(r['p99_s']):>7} {r['error_rate']:>7.1%} "
+              f"{r['peak_rss_mb']:>7.0f} {r['rss_per_user_mb']:>8.1f}")
+
+
+def compare(paths):
+    runs = [json.loads(Path(p).read_text()) for p in paths]
+    for run in runs:
+        print_curve(f"{run['label']} ({run['config']['mix']})", run['levels'])
+    base = {r['users']: r for r in runs[0]['levels']}
+    for run in runs[1:]:
+        print(f"\n{run['label']} vs {runs[0]['label']}:")
+        for r in run['levels']:
+            b = base.get(r['users'])
+            if b and b['throughput_rps'] and b['p99_s'] and r['p99_s']:
+                print(f"  {r['users']:>3} users: throughput {r['throughput_rps'] / b['throughput_rps'] - 1:+.0%}, "
+                      f"p99 {r['p99_s'] / b['p99_s'] - 1:+.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--levels', default='1,2,4,8', help="Comma-separated concurrent users per step")
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds per concurrency level")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('scan=0.3,requirements=0.4,chat=0.3'))
+    parser.add_argument('--corpus', help="Directory of document images (default: synthetic corpus)")
+    parser.add_argument('--corpus-size', type=int, default=30)
+    parser.add_argument('--recordings', default=DEFAULT_RECORDINGS)
+    parser.add_argument('--llm-speed', type=float, default=1.0, help="Stub latency scale (0 = instant)")
+    parser.add_argument('--region-method', default='auto', choices=AdvancedDocumentDetector.REGION_METHODS)
+    parser.add_argument('--dedup', action='store_true', help="Keep the near-duplicate index on")
+    parser.add_argument('--p99-limit', type=float, help="Stop ramping once p99 latency exceeds this (s)")
+    parser.add_argument('--label', default=time.strftime('%Y%m%d-%H%M%S'))
+    parser.add_argument('--output-dir', default='outputs/loadtest')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--compare', nargs='+', metavar='RUN_JSON', help="Print saved capacity curves side by side")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.compare)
+        return
+
+    if args.corpus:
+        corpus = sorted(p for p in Path(args.corpus).rglob('*') if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+    else:
+        corpus = build_corpus(Path(tempfile.mkdtemp()) / 'corpus', args.corpus_size, args.seed)
+    if args.mix.get('scan') and not corpus:
+        parser.error("empty corpus")
+
+    server, url = start_stub_server(args.recordings, args.llm_speed)
+    print(f"[INFO] LLM stub server at {url}")
+
+    detector = None
+    if args.mix.get('scan'):
+        detector = AdvancedDocumentDetector(languages=['en'], region_method=args.region_method,
+                                            pass_policy_path=None,
+                                            duplicate_threshold=6 if args.dedup else None, stage_cache=None)
+    test = LoadTest(detector, corpus, lambda: StubServerBackend(url), args.mix, args.seed)
+
+    levels = []
+    for users in (int(n) for n in args.levels.split(',')):
+        print(f"[INFO] {users} concurrent users for {args.duration:.0f}s...")
+        summary = test.run_level(users, args.duration)
+        levels.append(summary)
+        print_curve(args.label, [summary])
+        if args.p99_limit and summary['p99_s'] and summary['p99_s'] > args.p99_limit:
+            print(f"[WARNING] p99 {summary['p99_s']:.2f}s over the {args.p99_limit:.2f}s limit - stopping the ramp")
+            break
+    server.shutdown()
+
+    print_curve(f"Capacity curve: {args.label}", levels)
+    if args.p99_limit:
+        within = [r['users'] for r in levels
+                  if r['p99_s'] is not None and r['p99_s'] <= args.p99_limit and r['error_rate'] < 0.01]
+        print(f"\nCapacity: {max(within) if within else 0} concurrent users "
+              f"(p99 <= {args.p99_limit:.2f}s, errors < 1%)")
+
+    output = Path(args.output_dir) / f"{args.label}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        'label': args.label,
+        'config': {'levels': args.levels, 'duration_s': args.duration, 'mix': args.mix,
+                   'corpus': args.corpus or f"synthetic x{len(corpus)}", 'llm_speed': args.llm_speed,
+                   'region_method': args.region_method, 'dedup': args.dedup},
+        'levels': levels
+    }, indent=1))
+    print(f"[SUCCESS] Capacity curve saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark: OCR passes per document, default order vs learned pass policy
+
+Usage:
+    python benchmarks/pass_order_bench.py path/to/images --epochs 2
+
+The first run uses the fixed default order while training a fresh policy on
+the corpus; later epochs reuse the trained policy. Reports mean OCR passes and
+wall time per document for each run.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'src'))
+
+from document_detector_advanced import AdvancedDocumentDetector, DetectionEvent
+from pass_policy import PassPolicy
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
+
+
+def run(detector, files):
+    passes, elapsed, found = 0, 0.0, 0
+    for path in files:
+        start = time.perf_counter()
+        for event in detector.detect_document_iter(path):
+            if event.kind == DetectionEvent.OCR_PASS:
+                passes += 1
+            elif event.kind == DetectionEvent.RESULT:
+                found += 1
+        elapsed += time.perf_counter() - start
+    n = max(len(files), 1)
+    return {'documents': len(files), 'with_text': found,
+            'passes_per_doc': passes / n, 's_per_doc': elapsed / n}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('corpus', help="Directory of document images")
+    parser.add_argument('--epochs', type=int, default=2, help="Policy runs after the baseline")
+    parser.add_argument('--languages', default='en,hi')
+    args = parser.parse_args()
+
+    files = sorted(p for p in Path(args.corpus).rglob('*') if p.suffix.lower() in IMAGE_SUFFIXES)
+    if not files:
+        parser.error(f"no images under {args.corpus}")
+
+    detector = AdvancedDocumentDetector(languages=args.languages.split(','), duplicate_threshold=None,
+                                        stage_cache=None)
+    policy_path = Path(tempfile.mkdtemp()) / 'pass_policy.json'
+
+    # Baseline: fixed order, while a fresh policy records outcomes
+    detector.pass_policy = PassPolicy(policy_path, explore=0.0)
+    detector.pass_policy.order = lambda bucket, default: list(default)
+    baseline = run(detector, files)
+    detector.pass_policy.save()
+
+    rows = [('default order', baseline)]
+    for epoch in range(1, args.epochs + 1):
+        detector.pass_policy = PassPolicy(policy_path, explore=0.0, min_samples=3)
+        rows.append((f'learned policy #{epoch}', run(detector, files)))
+        detector.pass_policy.save()
+
+    print(f"\n{'run':<20} {'docs':>5} {'text':>5} {'passes/doc':>11} {'s/doc':>7}")
+    for name, r in rows:
+        print(f"{name:<20} {r['documents']:>5} {r['with_text']:>5} {r['passes_per_doc']:>11.2f} {r['s_per_doc']:>7.2f}")
+    saved = baseline['passes_per_doc'] - rows[-1][1]['passes_per_doc']
+    print(f"\nSaving: {saved:.2f} passes per document "
+          f"({saved / max(baseline['passes_per_doc'], 1e-9):.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Benchmark: speed and accuracy of each detection profile on the same corpus
+
+Usage:
+    python benchmarks/profile_bench.py --size 30 --label v1.5
+    python benchmarks/profile_bench.py --corpus path/to/images --labels labels.json
+
+Every profile runs over every document through one detector (per-call
+profile selection, as the app does), with the stage cache, duplicate index
+and learned pass order disabled so each run pays for all of its own work.
+The first document per profile is a warm-up (model loading) and not timed.
+
+Accuracy is measured against what is known:
+    type accuracy   document type vs the label - synthetic files are named
+                    <type>_NNN.jpg, real corpora need --labels
+    text accuracy   character similarity to the labelled text (--labels only)
+    agreement       character similarity to the 'accurate' profile's text,
+                    a reference when there are no text labels
+
+labels.json maps file names to {"document_type": ..., "text": ...} (either
+key optional). Results go to outputs/profile_bench/<label>.json; numbers
+depend on hardware and corpus, so publish them with the run's config.
+"""
+import argparse
+import difflib
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'src'))
+
+import torch
+
+from detection_profiles import PROFILES
+from document_detector_advanced import AdvancedDocumentDetector
+from load_test import build_corpus, percentile
+from memory_monitor import PeakMemoryMonitor
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif', '.webp'}
+DOCUMENT_TYPES = ('aadhaar', 'passport', 'pan')
+
+
+def similarity(a, b):
+    return difflib.SequenceMatcher(None, a.lower(), b.lower(), autojunk=False).ratio()
+
+
+def expected_type(path, labels):
+    label = labels.get(path.name, {})
+    if 'document_type' in label:
+        return label['document_type']
+    prefix = path.stem.split('_')[0]
+    return prefix if prefix in DOCUMENT_TYPES else None
+
+
+def run_profile(detector, profile, files):
+    """Per-document outcomes for one profile (the first file doubles as warm-up)"""
+    detector.detect_document(files[0], profile=profile)
+    rows = []
+    with PeakMemoryMonitor() as memory:
+        for path in files:
+            start = time.perf_counter()
+            result = detector.detect_document(path, profile=profile)
+            elapsed = time.perf_counter() - start
+            ok = 'error' not in result
+            rows.append({
+                'file': path.name,
+                'seconds': elapsed,
+                'ok': ok,
+                'document_type': result.get('document_type') if ok else None,
+                'confidence': result.get('avg_ocr_confidence') if ok else None,
+                'blocks': result.get('num_blocks', 0) if ok else 0,
+                'passes': result.get('ocr_passes', 0) if ok else 0,
+                'text': ' '.join(result['text_blocks'].texts) if ok else '',
+            })
+    return rows, memory.peak_mb
+
+
+def summarize(name, rows, peak_mb, labels, reference=None):
+    n = len(rows)
+    seconds = sorted(r['seconds'] for r in rows)
+    typed = [(r, expected_type(Path(r['file']), labels)) for r in rows]
+    typed = [(r, t) for r, t in typed if t]
+    texts = [(r, labels[r['file']]['text']) for r in rows if 'text' in labels.get(r['file'], {})]
+    confidences = [r['confidence'] for r in rows if r['confidence'] is not None]
+
+    summary = {
+        'profile': name,
+        'documents': n,
+        'success_rate': sum(r['ok'] for r in rows) / float(n),
+        's_per_doc': sum(seconds) / n,
+        'p50_s': percentile(seconds, 0.50),
+        'p95_s': percentile(seconds, 0.95),
+        'docs_per_min': 60.0 * n / sum(seconds) if sum(seconds) else None,
+        'passes_per_doc': sum(r['passes'] for r in rows) / float(n),
+        'blocks_per_doc': sum(r['blocks'] for r in rows) / float(n),
+        'mean_ocr_confidence': sum(confidences) / len(confidences) if confidences else None,
+        'type_accuracy': (sum(r['document_type'] == t for r, t in typed) / float(len(typed))) if typed else None,
+        'text_accuracy': (sum(similarity(r['text'], t) for r, t in texts) / len(texts)) if texts else None,
+        'agreement': None,
+        'peak_rss_mb': peak_mb,
+    }
+    if reference is not None:
+        by_file = {r['file']: r['text'] for r in reference}
+        summary['agreement'] = sum(similarity(r['text'], by_file.get(r['file'], '')) for r in rows) / float(n)
+    return summary
+
+
+def fmt(value, spec):
+    return format(value, spec) if value is not None else '-'
+
+
+def print_table(summaries):
+    print(f"\n{'profile':<10} {'docs':>5} {'ok':>5} {'s/doc':>7} {'p95 s':>7} {'docs/min':>9} {'passes':>7} "
+          f"{'conf':>6} {'type acc':>9} {'text acc':>9} {'agree':>6} {'RSS MB':>7}")
+    for s in summaries:
+        print(f"{s['profile']:<10} {s['documents']:>5} {s['success_rate']:>5.0%} {s['s_per_doc']:>7.2f} "
+              f"{fmt(s['p95_s'], '.2f'):>7} {fmt(s['docs_per_min'], '.1f'):>9} {s['passes_per_doc']:>7.2f} "
+              f"{fmt(s['mean_ocr_confidence'], '.2f'):>6} {fmt(s['type_accuracy'], '.0%'):>9} "
+              f"{fmt(s['text_accuracy'], '.0%'):>9} {fmt(s['agreement'], '.0%'):>6} {s['peak_rss_mb']:>7.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--corpus', help="Directory of document images (default: synthetic ID photos)")
+    parser.add_argument('--size', type=int, default=30, help="Synthetic corpus size")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--labels', help="JSON of file name -> {document_type, text}")
+    parser.add_argument('--profiles', default=','.join(PROFILES), help="Comma-separated profile names")
+    parser.add_argument('--languages', default='en')
+    parser.add_argument('--region-method', default='auto', choices=AdvancedDocumentDetector.REGION_METHODS)
+    parser.add_argument('--label', default='latest', help="Run name for the saved results")
+    parser.add_argument('--output-dir', default='outputs/profile_bench')
+    args = parser.parse_args()
+
+    profiles = [p for p in args.profiles.split(',') if p]
+    unknown = [p for p in profiles if p not in PROFILES]
+    if unknown:
+        parser.error(f"unknown profiles: {', '.join(unknown)}")
+
+    if args.corpus:
+        files = sorted(p for p in Path(args.corpus).rglob('*') if p.suffix.lower() in IMAGE_SUFFIXES)
+        if not files:
+            parser.error(f"no images under {args.corpus}")
+    else:
+        files = build_corpus(Path(tempfile.mkdtemp()) / 'corpus', args.size, args.seed)
+        print(f"[INFO] Synthetic corpus: {len(files)} documents")
+    labels = json.loads(Path(args.labels).read_text()) if args.labels else {}
+
+    detector = AdvancedDocumentDetector(languages=args.languages.split(','), region_method=args.region_method,
+                                        pass_policy_path=None, duplicate_threshold=None, stage_cache=None)
+
+    # Run 'accurate' first so the others can be compared with its text
+    order = sorted(profiles, key=lambda p: p != 'accurate')
+    runs = {}
+    for name in order:
+        print(f"[INFO] Profile '{name}' on {len(files)} documents...")
+        runs[name] = run_profile(detector, name, files)
+    reference = runs['accurate'][0] if 'accurate' in runs else None
+    summaries = [summarize(name, *runs[name], labels, reference if name != 'accurate' else None)
+                 for name in profiles]
+    print_table(summaries)
+
+    output = Path(args.output_dir) / f"{args.label}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        'label': args.label,
+        'config': {'corpus': args.corpus or f"synthetic x{len(files)} (seed {args.seed})",
+                   'labels': args.labels, 'languages': args.languages, 'region_method': args.region_method,
+                   'cpus': os.cpu_count(), 'cuda': torch.cuda.is_available(),
+                   'profiles': {name: PROFILES[name].summary() for name in profiles}},
+        'profiles': summaries,
+        'documents': {name: [{k: v for k, v in r.items() if k != 'text'} for r in runs[name][0]]
+                      for name in profiles}
+    }, indent=1))
+    print(f"[SUCCESS] Profile benchmark saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Token-budgeted Conversation Memory for the Visa Assistant"""
+
+
+class ConversationMemory:
+    """Keep recent turns verbatim and fold older turns into a rolling summary
+
+    count_tokens(text) -> int measures each message once when it is added
+    (VisaAssistant passes a locally calibrated estimate, not a remote call).
+    summarize(previous_summary, turns, max_tokens) -> str folds evicted turns
+    into the summary. Turns are evicted in user/assistant pairs so the
+    history always alternates roles. The last min_recent_turns are never
+    evicted; when they alone exceed the budget, the largest are shortened
+    (head and tail kept) so the history always fits max_tokens.
+    """
+
+    def __init__(self, count_tokens, summarize, max_tokens=2000, min_recent_turns=2, min_turn_tokens=16):
+        self.count_tokens = count_tokens
+        self.summarize = summarize
+        self.max_tokens = max_tokens
+        self.min_recent_turns = min_recent_turns
+        self.min_turn_tokens = min_turn_tokens
+        self.turns = []
+        self.summary = ""
+        self.summary_tokens = 0
+
+    def add(self, role, content):
+        """Append a turn; returns True if older turns were folded into the summary"""
+        self.turns.append({
+            'role': role,
+            'content': content,
+            'tokens': self.count_tokens(content)
+        })
+        return self.compact()
+
+    def total_tokens(self):
+        return self.summary_tokens + sum(t['tokens'] for t in self.turns)
+
+    def compact(self):
+        """Fold the oldest turns into the summary until memory fits the budget"""
+        evicted = []
+        while self.total_tokens() - sum(t['tokens'] for t in evicted) > self.max_tokens:
+            remaining = len(self.turns) - len(evicted)
+            step = 2 if remaining >= 2 and self.turns[len(evicted)]['role'] == 'user' else 1
+            if remaining - step < self.min_recent_turns:
+                break
+            evicted.extend(self.turns[len(evicted):len(evicted) + step])
+
+        if evicted:
+            del self.turns[:len(evicted)]
+            # The summary gets a quarter of the budget, the rest stays for verbatim turns
+            summary_budget = self.max_tokens // 4
+            self.summary = self.summarize(self.summary, evicted, summary_budget)
+            self.summary_tokens = self.count_tokens(self.summary)
+            if self.summary_tokens > summary_budget:
+                self.summary = self._shorten(self.summary, self.summary_tokens, summary_budget)
+                self.summary_tokens = self.count_tokens(self.summary)
+            print(f"[INFO] Folded {len(evicted)} turns into summary ({self.summary_tokens} tokens)")
+
+        return self._fit_recent() or bool(evicted)
+
+    def _fit_recent(self):
+        """Shorten the largest remaining turns until the memory fits; True if any changed"""
+        changed = False
+        while self.total_tokens() > self.max_tokens:
+            turn = max(self.turns, key=lambda t: t['tokens'], default=None)
+            if turn is None or turn['tokens'] <= self.min_turn_tokens:
+                break
+            target = max(self.min_turn_tokens, turn['tokens'] - (self.total_tokens() - self.max_tokens))
+            content = self._shorten(turn['content'], turn['tokens'], target)
+            tokens = self.count_tokens(content)
+            if tokens >= turn['tokens']:
+                break
+            turn['content'], turn['tokens'] = content, tokens
+            changed = True
+        if changed:
+            print(f"[INFO] Shortened recent turns to fit the memory budget ({self.total_tokens()} tokens)")
+        return changed
+
+    def _shorten(self, text, tokens, target):
+        """Keep the head and tail of text at roughly target tokens"""
+        marker = " [...] "
+        keep = max(0, int(len(text) * target / float(max(tokens, 1))) - len(marker))
+        head = keep * 2 // 3
+        return text[:head] + marker + text[len(text) - (keep - head):] if keep - head > 0 else text[:head] + marker
+
+    def history(self):
+        """Gemini-style history: optional summary exchange followed by recent turns"""
+        history = []
+        if self.summary:
+            history.append({'role': 'user', 'parts': [f"Summary of our earlier conversation:\n{self.summary}"]})
+            history.append({'role': 'model', 'parts': ["Understood, I'll keep that context in mind."]})
+        for turn in self.turns:
+            role = 'model' if turn['role'] == 'assistant' else 'user'
+            history.append({'role': role, 'parts': [turn['content']]})
+        return history
+
+    def clear(self):
+        self.turns = []
+        self.summary = ""
+        self.summary_tokens = 0
@@ -0,0 +1,82 @@
+"""Speed/Accuracy Profiles for the detection pipeline"""
+import hashlib
+import json
+
+
+class DetectionProfile:
+    """Named bundle of every knob that trades speed for accuracy
+
+    max_side        longest side the decoded image is downscaled to (None = full resolution)
+    canvas_size     EasyOCR text-detection canvas (its own default is 2560)
+    clahe           (clip limit, tile grid) for contrast enhancement
+    bilateral       (diameter, sigma color, sigma space), or None to skip the denoise step
+    max_passes      most OCR passes run per image (crop, full, original)
+    min_conf        minimum block confidence per pass
+    yolo_model      YOLOv8 weights used when region detection falls back to YOLO
+    yolo_conf       YOLO detection threshold
+    yolo_padding    pixels kept around the YOLO box
+    decoder         EasyOCR decoder: 'greedy' or 'beamsearch'
+    beam_width      beam width for 'beamsearch'
+    tiling          split very large scans into tiles (see tiled_ocr.py)
+    orientation     estimate and correct rotation/skew before OCR
+    """
+
+    def __init__(self, name, max_side=None, canvas_size=2560, clahe=(2.0, 8), bilateral=(9, 75, 75),
+                 max_passes=3, min_conf=None, yolo_model='yolov8n.pt', yolo_conf=0.3, yolo_padding=20,
+                 decoder='greedy', beam_width=5, tiling=True, orientation=True):
+        if decoder not in ('greedy', 'beamsearch'):
+            raise ValueError(f"Unknown decoder: {decoder}")
+        self.name = name
+        self.max_side = max_side
+        self.canvas_size = canvas_size
+        self.clahe = clahe
+        self.bilateral = bilateral
+        self.max_passes = max_passes
+        self.min_conf = dict(min_conf or {'crop': 0.1, 'full': 0.1, 'original': 0.05})
+        self.yolo_model = yolo_model
+        self.yolo_conf = yolo_conf
+        self.yolo_padding = yolo_padding
+        self.decoder = decoder
+        self.beam_width = beam_width
+        self.tiling = tiling
+        self.orientation = orientation
+
+    def recognize_kwargs(self):
+        """Keyword arguments for EasyOCR readtext/recognize"""
+        return {'decoder': self.decoder, 'beamWidth': self.beam_width}
+
+    def summary(self):
+        return dict(vars(self))
+
+    def key(self):
+        """Stable digest of every setting - cache keys use it so same-named custom profiles never collide"""
+        settings = json.dumps(self.summary(), sort_keys=True, default=str)
+        return f"{self.name}-{hashlib.sha1(settings.encode()).hexdigest()[:12]}"
+
+    def __repr__(self):
+        return f"DetectionProfile({self.name})"
+
+
+PROFILES = {
+    # Bulk backfills: half-resolution detection, one preprocessing step, no orientation probe
+    'fast': DetectionProfile(
+        'fast', max_side=1600, canvas_size=1280, bilateral=None, max_passes=2,
+        tiling=False, orientation=False),
+    # Interactive scans: the pipeline's long-standing defaults
+    'balanced': DetectionProfile('balanced'),
+    # Hard inputs: larger detector and canvas, looser YOLO box, beam-search decoding
+    'accurate': DetectionProfile(
+        'accurate', canvas_size=3200, yolo_model='yolov8s.pt', yolo_conf=0.25, yolo_padding=30,
+        decoder='beamsearch', beam_width=10),
+}
+DEFAULT_PROFILE = 'balanced'
+
+
+def get_profile(profile=None):
+    """Resolve a profile name (None = balanced) or pass a DetectionProfile through"""
+    if isinstance(profile, DetectionProfile):
+        return profile
+    name = profile or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown detection profile: {name} (choose from {', '.join(PROFILES)})")
+    return PROFILES[name]
@@ -2,27 +2,135 @@
 import cv2
 import numpy as np
 from pathlib import Path
-import easyocr
 from PIL import Image
 import re
 import fitz
 import docx
 import io
+import time
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from ultralytics import YOLO
 import torch
+from document_locator import DocumentLocator
+from script_detector import ReaderPool, ScriptDetector
+from memory_monitor import PeakMemoryMonitor
+from text_blocks import TextBlocks
+from pass_policy import PassPolicy, feature_bucket, image_features
+from tiled_ocr import TiledOCR
+from duplicate_index import DuplicateIndex
+import metrics
+import profiler
+from stage_cache import SHARED_STAGE_CACHE, file_digest
+from orientation import OrientationEstimator
+from detection_profiles import get_profile
+
+
+class DetectionEvent:
+    """Progress event yielded by AdvancedDocumentDetector.detect_document_iter
+    
+    kind is one of the constants below; data holds the stage payload:
+        DECODED        shape, file_type
+        REGION         method, confidence, box (4 corner points), image (crop/warp)
+        OCR_PASS       pass_number, label, text_blocks, accepted
+        DUPLICATE      distance (near-duplicate of an earlier scan - OCR is skipped)
+        PAGE           page, pages_done, text_blocks (multi-page images, after each page)
+        DOCUMENT_TYPE  document_type, confidence
+        FIELDS         fields
+        TIMINGS        timings (seconds per stage)
+        RESULT         result (same dict detect_document returns)
+        ERROR          error
+    """
+    DECODED = 'decoded'
+    REGION = 'region'
+    OCR_PASS = 'ocr_pass'
+    DUPLICATE = 'duplicate'
+    PAGE = 'page'
+    DOCUMENT_TYPE = 'document_type'
+    FIELDS = 'fields'
+    TIMINGS = 'timings'
+    RESULT = 'result'
+    ERROR = 'error'
+    
+    def __init__(self, kind, **data):
+        self.kind = kind
+        self.data = data
+    
+    def __repr__(self):
+        return f"DetectionEvent({self.kind}, {sorted(self.data)})"
+
 
 class AdvancedDocumentDetector:
-    def __init__(self, languages=['en', 'hi']):
+    # 'auto' tries the classical boundary detector first and only runs YOLO
+    # when no confident quadrilateral is found
+    REGION_METHODS = ('auto', 'classical', 'yolo')
+    
+    # OCR passes: name -> (label, preprocess, min confidence unless the profile overrides it)
+    OCR_PASSES = {
+        'crop': ("cropped region", True, 0.1),
+        'full': ("full image", True, 0.1),
+        'original': ("original", False, 0.05),  # Even lower threshold
+    }
+    DEFAULT_PASS_ORDER = ('crop', 'full', 'original')
+
+    def __init__(self, languages=['en', 'hi'], region_method='auto', pass_policy_path='outputs/pass_policy.json',
+                 ocr_workers=None, tile_min_side=3000, duplicate_threshold=None, stage_cache=SHARED_STAGE_CACHE,
+                 correct_orientation=True, profile='balanced'):
         print(f"[INFO] Loading models...")
         
-        try:
-            self.yolo_model = YOLO('yolov8n.pt')
-        except Exception as e:
-            print(f"[WARNING] YOLO model failed to load: {e}")
-            self.yolo_model = None
+        if region_method not in self.REGION_METHODS:
+            raise ValueError(f"Unknown region method: {region_method}")
+        self.region_method = region_method
+        self.locator = DocumentLocator()
+        
+        # Learned OCR pass ordering per input bucket (None = always the default order)
+        self.pass_policy = PassPolicy(pass_policy_path) if pass_policy_path else None
+        
+        # Near-duplicate photos of the same document reuse the earlier OCR within one session
+        # (calls without a session never use it; None = disabled, the default)
+        self.duplicate_index = DuplicateIndex(duplicate_threshold) if duplicate_threshold is not None else None
+        
+        # Language-independent stages (decode, region, preprocessing, text detection) shared
+        # across detectors per input hash, so a language change only re-runs recognition (None = off)
+        self.stage_cache = stage_cache
+        
+        # Sideways/upside-down/skewed photos are straightened before the first OCR pass
+        self.orientation = OrientationEstimator() if correct_orientation else None
+        
+        # Default speed/accuracy profile; detect_document(path, profile=...) overrides it per call
+        self.profile = get_profile(profile)
+        
+        self.yolo_model = None
+        self.yolo_models = {}  # weights -> model, other profiles' variants load on first use
+        self._yolo_lock = threading.Lock()
+        # The detector is shared by every session; ultralytics models are not safe to call concurrently
+        self._yolo_predict_lock = threading.Lock()
+        if region_method != 'classical':
+            try:
+                self.yolo_model = YOLO(self.profile.yolo_model)
+            except Exception as e:
+                print(f"[WARNING] YOLO model failed to load: {e}")
+            self.yolo_models[self.profile.yolo_model] = self.yolo_model
+        
+        # languages='auto' picks the smallest reader per document from the pool
+        self.auto_languages = 'auto' in languages
+        self.languages = ['en'] if self.auto_languages else list(languages)
+        self.reader_pool = ReaderPool(gpu=torch.cuda.is_available())
+        self.script_detector = ScriptDetector(self.reader_pool) if self.auto_languages else None
+        
+        # Worker pool for parallel OCR work (tiles of very large scans)
+        self.ocr_workers = ocr_workers or max(1, min(4, (os.cpu_count() or 2) // 2))
+        self.executor = ThreadPoolExecutor(max_workers=self.ocr_workers, thread_name_prefix='ocr')
+        self.tiler = TiledOCR(self.executor, min_side=tile_min_side)
+        # Pages of multi-page images get their own pool: a page task waits on its tiles,
+        # so sharing one pool lets concurrent scans fill it with waiting pages (deadlock)
+        self.page_executor = ThreadPoolExecutor(max_workers=max(1, self.ocr_workers - 1),
+                                                thread_name_prefix='ocr-page')
         
         try:
-            self.reader = easyocr.Reader(languages, gpu=torch.cuda.is_available())
+            self.reader = self.reader_pool.get(self.languages)
         except Exception as e:
             print(f"[ERROR] EasyOCR failed to initialize: {e}")
             raise
@@ -43,18 +151,51 @@ class AdvancedDocumentDetector:
         }
         print("[SUCCESS] Models loaded!")
     
-    def detect_document_region(self, image_path):
+    def detect_document_region(self, image, profile=None):
+        """Detect document region - classical quad fit first, YOLO as fallback
+        
+        Accepts a file path or an already-decoded BGR array. Returns
+        (cropped, confidence, method, box) where method is 'classical',
+        'yolo' or 'full' (no region found, whole image returned) and box is
+        the region's 4 corner points in image coordinates. YOLO crops are
+        views into the input image, not copies.
+        """
+        img = image if isinstance(image, np.ndarray) else cv2.imread(str(image))
+        if img is None:
+            print(f"[ERROR] Failed to read image: {image}")
+            return None, None, None, None
+        
+        if self.region_method in ('auto', 'classical'):
+            try:
+                warped, conf, quad = self.locator.locate(img)
+                if warped is not None:
+                    print(f"[SUCCESS] Document boundary found (confidence: {conf:.2%})")
+                    return warped, conf, 'classical', quad.tolist()
+            except Exception as e:
+                print(f"[WARNING] Classical boundary detection failed: {e}")
+            
+            if self.region_method == 'classical':
+                return img, 1.0, 'full', self._full_box(img)
+        
+        cropped, conf, box = self._detect_region_yolo(img, profile)
+        if cropped is None:
+            return None, None, None, None
+        return cropped, conf, 'yolo' if cropped is not img else 'full', box
+    
+    def _full_box(self, img):
+        h, w = img.shape[:2]
+        return [[0, 0], [w - 1, 0], [w - 1, h - 1], [0, h - 1]]
+    
+    def _detect_region_yolo(self, img, profile=None):
         """Detect document region using YOLO"""
-        if not self.yolo_model:
-            return None, None
+        profile = self._profile(profile)
+        model = self._yolo(profile.yolo_model)
+        if not model:
+            return None, None, None
         
         try:
-            img = cv2.imread(str(image_path))
-            if img is None:
-                print(f"[ERROR] Failed to read image: {image_path}")
-                return None, None
-                
-            results = self.yolo_model(img, conf=0.3, verbose=False)
+            with self._yolo_predict_lock:
+                results = model(img, conf=profile.yolo_conf, verbose=False)
             
             if len(results[0].boxes) > 0:
                 box = results[0].boxes[0]
@@ -62,146 +203,401 @@ class AdvancedDocumentDetector:
                 conf = float(box.conf[0])
                 
                 # Add padding
-                p = 20
-                cropped = img[max(0, y1-p):min(img.shape[0], y2+p), 
-                             max(0, x1-p):min(img.shape[1], x2+p)]
+                p = profile.yolo_padding
+                x1, y1 = max(0, x1-p), max(0, y1-p)
+                x2, y2 = min(img.shape[1], x2+p), min(img.shape[0], y2+p)
+                cropped = img[y1:y2, x1:x2]
                 print(f"[SUCCESS] YOLO detected document region (confidence: {conf:.2%})")
-                return cropped, conf
+                return cropped, conf, [[x1, y1], [x2 - 1, y1], [x2 - 1, y2 - 1], [x1, y2 - 1]]
             
             # Return full image if no detection
-            return img, 1.0
+            return img, 1.0, self._full_box(img)
             
         except Exception as e:
             print(f"[ERROR] YOLO detection failed: {e}")
-            return None, None
+            return None, None, None
     
-    def preprocess_for_ocr(self, img):
-        """Preprocess image for better OCR results"""
+    def _yolo(self, variant):
+        """YOLO model for a profile's weights, loaded on first use (None if loading fails)"""
+        with self._yolo_lock:
+            if variant not in self.yolo_models:
+                try:
+                    self.yolo_models[variant] = YOLO(variant)
+                except Exception as e:
+                    print(f"[WARNING] YOLO model {variant} failed to load: {e}")
+                    self.yolo_models[variant] = None
+            return self.yolo_models[variant]
+    
+    def _profile(self, profile):
+        """Resolve a per-call profile (name or DetectionProfile), falling back to the detector's"""
+        return self.profile if profile is None else get_profile(profile)
+    
+    def preprocess_for_ocr(self, img, profile=None):
+        """Preprocess image for better OCR results
+        
+        Uses two grayscale buffers in total: the input is never modified,
+        the bilateral filter writes back into the grayscale buffer and Otsu
+        thresholding runs in place. The profile sets the CLAHE and
+        bilateral parameters; without a bilateral step, Otsu runs on the
+        CLAHE output directly.
+        """
+        profile = self._profile(profile)
         # Convert to grayscale if needed
         if len(img.shape) == 3:
             gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         else:
-            gray = img
+            gray = np.empty_like(img)
         
         # Apply CLAHE for better contrast
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        enhanced = clahe.apply(gray)
+        clip_limit, tile = profile.clahe
+        clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(tile, tile))
+        enhanced = clahe.apply(img if len(img.shape) == 2 else gray)
+        
+        if profile.bilateral:
+            # Apply bilateral filter to denoise while preserving edges
+            # (cannot run in place, so reuse the grayscale buffer as destination)
+            cv2.bilateralFilter(enhanced, *profile.bilateral, dst=gray)
+            del enhanced
+        else:
+            gray = enhanced
         
-        # Apply bilateral filter to denoise while preserving edges
-        denoised = cv2.bilateralFilter(enhanced, 9, 75, 75)
+        # Apply thresholding in place
+        cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=gray)
         
-        # Apply thresholding
-        _, binary = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return gray
+    
+    def _ocr_pass(self, reader, img, min_conf, label, pass_number=0, page=0, detect_key=None, profile=None):
+        """Run EasyOCR on an array and keep non-empty blocks above min_conf
+        
+        Grayscale arrays are passed as-is - EasyOCR accepts them, so there
+        is no need to expand them back to three channels first. Very large
+        scans are split into overlapping tiles and recognized in parallel.
+        With a detect_key, CRAFT text boxes come from the stage cache and
+        only recognition runs (readtext is detect + recognize). The profile
+        sets the detection canvas, the decoder and whether tiling is allowed.
+        """
+        profile = self._profile(profile)
+        decoding = profile.recognize_kwargs()
+        print(f"[INFO] Running OCR on {label}...")
+        if profile.tiling and self.tiler.should_tile(img):
+            results = self.tiler.readtext(reader, img, **decoding)
+        elif detect_key is not None:
+            horizontal, free = self._cached(detect_key, lambda: reader.detect(img, canvas_size=profile.canvas_size))
+            results = reader.recognize(img, horizontal[0], free[0], detail=1, **decoding)
+        else:
+            results = reader.readtext(img, detail=1, canvas_size=profile.canvas_size, **decoding)
+        print(f"[DEBUG] OCR found {len(results)} raw results in {label}")
+        
+        text_blocks = TextBlocks.from_easyocr(results, min_conf, page=page, pass_number=pass_number)
+        for text, conf in zip(text_blocks.texts, text_blocks.confidence):
+            print(f"[DEBUG] Text: '{text}' | Conf: {conf:.2f}")
+        return text_blocks
+    
+    def process_image(self, image_path, profile=None, session=None):
+        """Process image with OCR - Pass numpy arrays directly to EasyOCR
         
-        return binary
+        Returns (text_blocks, info). See _iter_image for the staged version.
+        """
+        return self._drain(self._iter_image(image_path, {}, profile, session))
+    
+    def _drain(self, events):
+        """Run a stage generator to completion and return its return value"""
+        while True:
+            try:
+                next(events)
+            except StopIteration as stop:
+                return stop.value
+    
+    def _cached(self, key, compute):
+        """Stage result from the stage cache; key is (stage, input key, parameters...)"""
+        if self.stage_cache is None or key[1] is None:
+            return compute()
+        return self.stage_cache.get_or_compute(key, compute)
+    
+    def _collect(self, events):
+        """Run a stage generator to completion and return (events, return value)"""
+        collected = []
+        while True:
+            try:
+                collected.append(next(events))
+            except StopIteration as stop:
+                return collected, stop.value
+    
+    def count_frames(self, image_path):
+        """Number of frames/pages in an image file (reads the header only)"""
+        try:
+            with Image.open(image_path) as im:
+                return getattr(im, 'n_frames', 1)
+        except Exception:
+            return 1
+    
+    def iter_frames(self, image_path):
+        """Lazily yield (page, BGR array) for each frame - one frame decoded at a time"""
+        with Image.open(image_path) as im:
+            for page in range(getattr(im, 'n_frames', 1)):
+                im.seek(page)
+                yield page, cv2.cvtColor(np.asarray(im.convert('RGB')), cv2.COLOR_RGB2BGR)
+    
+    def _iter_image(self, image_path, timings, profile=None, session=None):
+        """Staged image OCR - yields DetectionEvents, returns (text_blocks, info)
+        
+        The image is decoded once and shared with region detection; each
+        preprocessed buffer is released as soon as its OCR pass finishes.
+        Stage durations are written into timings. Multi-page TIFFs and other
+        multi-frame images are handed to _iter_pages.
+        """
+        digest = file_digest(image_path) if self.stage_cache is not None else None
+        if self.count_frames(image_path) > 1:
+            return (yield from self._iter_pages(image_path, timings, digest, profile, session))
+        
+        # Read original image (once - region detection reuses it)
+        start = time.perf_counter()
+        input_key = f"{digest}#0" if digest else None
+        original_img = self._cached(('decoded', input_key), lambda: cv2.imread(str(image_path)))
+        timings['decode'] = time.perf_counter() - start
+        if original_img is None:
+            print(f"[ERROR] Could not read image: {image_path}")
+            return TextBlocks(), {}
+        return (yield from self._iter_array(original_img, Path(image_path).suffix, timings, 0, input_key,
+                                            profile, session))
     
-    def process_image(self, image_path):
-        """Process image with OCR - Pass numpy arrays directly to EasyOCR"""
+    def _iter_pages(self, image_path, timings, digest=None, profile=None, session=None):
+        """OCR every frame of a multi-page image on the page pool, yielding events in page order
+        
+        Frames are decoded lazily and at most ocr_workers - 1 pages are in
+        flight, which bounds memory (with a single worker, pages run
+        inline). Pages run on page_executor and their tiles on executor,
+        so a page never waits on work queued behind it. Each page's events
+        are tagged with its page number and followed by a PAGE event.
+        """
+        suffix = Path(image_path).suffix
+        in_flight = self.ocr_workers - 1
+        parts, infos = [], []
+        
+        def run_page(page, img):
+            page_timings = {}
+            input_key = f"{digest}#{page}" if digest else None
+            events, (text_blocks, info) = self._collect(
+                self._iter_array(img, suffix, page_timings, page, input_key, profile, session))
+            return page, events, text_blocks, info, page_timings
+        
+        def finish(outcome):
+            page, events, text_blocks, info, page_timings = outcome
+            for event in events:
+                event.data['page'] = page
+                yield event
+            for stage, seconds in page_timings.items():
+                timings[stage] = timings.get(stage, 0.0) + seconds
+            parts.append(text_blocks)
+            infos.append(info)
+            print(f"[INFO] Page {page + 1}: {len(text_blocks)} text blocks")
+            yield DetectionEvent(DetectionEvent.PAGE, page=page, pages_done=len(parts), text_blocks=text_blocks)
+        
+        pending = deque()
         try:
-            # Read original image
-            original_img = cv2.imread(str(image_path))
-            if original_img is None:
-                print(f"[ERROR] Could not read image: {image_path}")
-                return [], None
+            for page, img in self.iter_frames(image_path):
+                if in_flight < 1:
+                    yield from finish(run_page(page, img))
+                    continue
+                pending.append(self.page_executor.submit(profiler.bind(run_page), page, img))
+                img = None
+                if len(pending) >= in_flight:
+                    yield from finish(pending.popleft().result())
+            while pending:
+                yield from finish(pending.popleft().result())
+        except Exception as e:
+            print(f"[ERROR] Multi-page image processing failed after {len(parts)} pages: {e}")
+        finally:
+            # Consumer stopped early or a frame failed: drop pages not yet started
+            for future in pending:
+                future.cancel()
+        
+        text_blocks = TextBlocks.concat(parts)
+        info = next((i for i in infos if i), {})
+        if info:
+            info = dict(info, pages=len(parts), ocr_passes=sum(i.get('ocr_passes', 0) for i in infos),
+                        ocr_fallback=any(i.get('ocr_fallback') for i in infos))
+        print(f"[SUCCESS] Extracted {len(text_blocks)} text blocks from {len(parts)} pages")
+        return text_blocks, info
+    
+    def _iter_array(self, original_img, source_format, timings, page=0, input_key=None, profile=None,
+                    session=None):
+        """Region detection, script selection and OCR passes for one decoded image
+        
+        input_key ('<file sha256>#<page>') enables the stage cache; cached
+        arrays are shared between requests and never modified here.
+        """
+        profile = self._profile(profile)
+        try:
+            yield DetectionEvent(DetectionEvent.DECODED, shape=original_img.shape, file_type='image')
             
-            # Get cropped region from YOLO
-            cropped, yolo_conf = self.detect_document_region(image_path)
+            # Profile resolution limit - every later stage works on the smaller copy
+            scale = 1.0
+            if profile.max_side and max(original_img.shape[:2]) > profile.max_side:
+                scale = profile.max_side / float(max(original_img.shape[:2]))
+                original_img = self._cached(
+                    ('resized', input_key, profile.max_side),
+                    lambda: cv2.resize(original_img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA))
             
-            text_blocks = []
+            # Get cropped region (classical quad fit or YOLO)
+            start = time.perf_counter()
+            cropped, region_conf, region_method, region_box = self._cached(
+                ('region', input_key, self.region_method, profile.key()),
+                lambda: self.detect_document_region(original_img, profile))
+            timings['region'] = time.perf_counter() - start
+            yield DetectionEvent(DetectionEvent.REGION, method=region_method, confidence=region_conf,
+                                 box=region_box, image=cropped)
             
-            # Try cropped region first if available
-            if cropped is not None and cropped.size > 0:
-                print(f"[INFO] Processing cropped region: {cropped.shape}")
-                
-                # Preprocess cropped image
-                preprocessed = self.preprocess_for_ocr(cropped)
-                
-                # Convert back to BGR for EasyOCR (it expects BGR format)
-                preprocessed_bgr = cv2.cvtColor(preprocessed, cv2.COLOR_GRAY2BGR)
-                
-                # Run OCR directly on numpy array
-                print("[INFO] Running OCR on cropped region...")
-                try:
-                    results = self.reader.readtext(preprocessed_bgr, detail=1)
-                    print(f"[DEBUG] OCR found {len(results)} raw results in cropped region")
-                    
-                    for item in results:
-                        if len(item) >= 2:
-                            text = item[1].strip()
-                            conf = item[2] if len(item) > 2 else 0.9
-                            print(f"[DEBUG] Text: '{text}' | Conf: {conf:.2f}")
-                            if len(text) > 0 and conf > 0.1:
-                                text_blocks.append({
-                                    'text': text, 
-                                    'confidence': float(conf)
-                                })
-                except Exception as e:
-                    print(f"[WARNING] Cropped region OCR failed: {e}")
+            # Perceptual hash of the document region - documents re-photographed in the same
+            # session skip OCR (a hash hit is confirmed pixel by pixel before reuse)
+            fingerprint = None
+            if self.duplicate_index is not None and session is not None:
+                start = time.perf_counter()
+                fingerprint = self.duplicate_index.fingerprint(
+                    cropped if cropped is not None and cropped.size > 0 else original_img)
+                match = self.duplicate_index.lookup(fingerprint, self._duplicate_scope(profile, session))
+                timings['hash'] = time.perf_counter() - start
+                metrics.DUPLICATE_LOOKUPS.inc(result='hit' if match is not None else 'miss')
+                if match is not None:
+                    (text_blocks, info), distance = match
+                    print(f"[INFO] Near-duplicate of an earlier scan (distance {distance}), reusing its OCR")
+                    yield DetectionEvent(DetectionEvent.DUPLICATE, distance=distance)
+                    if len(text_blocks) and text_blocks.pages[0] != page:
+                        text_blocks = TextBlocks(text_blocks.texts, text_blocks.confidence, text_blocks.boxes,
+                                                 np.full(len(text_blocks), page), text_blocks.passes)
+                    return text_blocks, dict(info, duplicate_distance=distance, ocr_passes=0, ocr_fallback=False)
             
-            # If no results, try full original image
-            if len(text_blocks) == 0:
-                print("[WARNING] No text in cropped region, trying full image...")
-                
-                # Preprocess full image
-                preprocessed = self.preprocess_for_ocr(original_img)
+            has_crop = cropped is not None and cropped.size > 0
+            
+            # Upright and deskew before the first OCR pass - rotated photos otherwise fail every pass
+            # (the setting is part of the later cache keys: corrected and raw images differ)
+            rotation, skew = 0, 0.0
+            orient = self.orientation is not None and profile.orientation
+            if orient:
+                start = time.perf_counter()
+                rotation, skew = self._cached(
+                    ('orientation', input_key, self.region_method, profile.key(), orient),
+                    lambda: self.orientation.estimate(cropped if has_crop else original_img, self.reader))
+                if rotation or skew:
+                    print(f"[INFO] Correcting orientation: rotate {rotation}°, deskew {skew:.1f}°")
+                    corrected = self.orientation.correct(original_img, rotation, skew)
+                    if has_crop:
+                        cropped = (corrected if cropped is original_img
+                                   else self.orientation.correct(cropped, rotation, skew))
+                    original_img = corrected
+                timings['orientation'] = time.perf_counter() - start
+            
+            # Pick the reader for this document's script
+            reader, languages = self.reader, self.languages
+            if self.auto_languages:
+                start = time.perf_counter()
+                reader, languages = self._select_reader(cropped if has_crop else original_img)
+                timings['script'] = time.perf_counter() - start
+            
+            # Order the OCR passes for this kind of input (learned policy or default)
+            bucket, order = None, self.DEFAULT_PASS_ORDER
+            if self.pass_policy is not None:
+                bucket = feature_bucket(image_features(original_img, source_format))
+                order = self.pass_policy.order(bucket, self.DEFAULT_PASS_ORDER)
+            
+            caching = input_key is not None and self.stage_cache is not None
+            text_blocks = TextBlocks()
+            tried = []
+            accepted = None
+            
+            for name in order:
+                label, preprocess, min_conf = self.OCR_PASSES[name]
+                min_conf = profile.min_conf.get(name, min_conf)
+                if name == 'crop' and not has_crop:
+                    continue
+                # Without a detected region the crop is the full image - never OCR it twice
+                if region_method == 'full' and name in ('crop', 'full') and ({'crop', 'full'} & set(tried)):
+                    continue
                 
-                # Convert back to BGR for EasyOCR
-                preprocessed_bgr = cv2.cvtColor(preprocessed, cv2.COLOR_GRAY2BGR)
+                if len(tried) >= profile.max_passes:
+                    print(f"[INFO] {profile.name.capitalize()} profile stops after {profile.max_passes} OCR passes")
+                    break
+                if tried:
+                    print(f"[WARNING] No text found yet, trying {label}...")
+                tried.append(name)
+                source = cropped if name == 'crop' else original_img
+                print(f"[INFO] Processing {label}: {source.shape}")
                 
-                # Run OCR directly on numpy array
-                print("[INFO] Running OCR on full image...")
+                start = time.perf_counter()
                 try:
-                    results = self.reader.readtext(preprocessed_bgr, detail=1)
-                    print(f"[DEBUG] OCR found {len(results)} results in full image")
-                    
-                    for item in results:
-                        if len(item) >= 2:
-                            text = item[1].strip()
-                            conf = item[2] if len(item) > 2 else 0.9
-                            print(f"[DEBUG] Text: '{text}' | Conf: {conf:.2f}")
-                            if len(text) > 0 and conf > 0.1:
-                                text_blocks.append({
-                                    'text': text, 
-                                    'confidence': float(conf)
-                                })
+                    if preprocess:
+                        image = self._cached(
+                            ('preprocessed', input_key, self.region_method, profile.key(), orient, name),
+                            lambda: self.preprocess_for_ocr(source, profile))
+                    else:
+                        image = source
+                    detect_key = (('detect', input_key, self.region_method, profile.key(), orient, name)
+                                  if caching else None)
+                    text_blocks = self._ocr_pass(reader, image, min_conf, label, len(tried), page, detect_key, profile)
                 except Exception as e:
-                    print(f"[ERROR] Full image OCR failed: {e}")
-                    import traceback
-                    traceback.print_exc()
+                    print(f"[ERROR] {label.capitalize()} OCR failed: {e}")
+                finally:
+                    image = source = None
+                if name == 'crop':
+                    cropped = None
+                timings[f'ocr_pass_{len(tried)}'] = time.perf_counter() - start
+                
+                yield DetectionEvent(DetectionEvent.OCR_PASS, pass_number=len(tried), label=label,
+                                     text_blocks=text_blocks, accepted=len(text_blocks) > 0)
+                metrics.OCR_PASSES.inc(ocr_pass=name, accepted=str(len(text_blocks) > 0).lower())
+                if len(text_blocks) > 0:
+                    accepted = name
+                    break
             
-            # If still no results, try original image without preprocessing
-            if len(text_blocks) == 0:
-                print("[WARNING] Trying original image without preprocessing...")
-                try:
-                    results = self.reader.readtext(original_img, detail=1)
-                    print(f"[DEBUG] OCR found {len(results)} results in original")
-                    
-                    for item in results:
-                        if len(item) >= 2:
-                            text = item[1].strip()
-                            conf = item[2] if len(item) > 2 else 0.9
-                            print(f"[DEBUG] Text: '{text}' | Conf: {conf:.2f}")
-                            if len(text) > 0 and conf > 0.05:  # Even lower threshold
-                                text_blocks.append({
-                                    'text': text, 
-                                    'confidence': float(conf)
-                                })
-                except Exception as e:
-                    print(f"[ERROR] Original image OCR failed: {e}")
+            if self.pass_policy is not None and tried:
+                self.pass_policy.record(bucket, tried, accepted)
             
             print(f"[SUCCESS] Extracted {len(text_blocks)} text blocks")
-            return text_blocks, yolo_conf
+            info = {
+                'region_method': region_method,
+                'region_confidence': region_conf,
+                'region_box': region_box,
+                'languages': languages,
+                'ocr_passes': len(tried),
+                'ocr_fallback': len(tried) > 1,
+                'ocr_pass_order': tried,
+                'accepted_pass': accepted,
+                'input_bucket': bucket,
+                'rotation': rotation,
+                'skew': skew,
+                'input_scale': scale,
+                'profile': profile.name,
+                'pages': 1
+            }
+            if fingerprint is not None and len(text_blocks):
+                self.duplicate_index.add(fingerprint, (text_blocks, info), self._duplicate_scope(profile, session))
+            return text_blocks, info
             
         except Exception as e:
             print(f"[ERROR] Image processing failed: {e}")
             import traceback
             traceback.print_exc()
-            return [], None
+            return TextBlocks(), {}
+    
+    def _duplicate_scope(self, profile=None, session=None):
+        """Only results from the same session produced with the same OCR settings are reused"""
+        return (session, 'auto' if self.auto_languages else tuple(self.languages), self.region_method,
+                self._profile(profile).key())
+    
+    def _select_reader(self, img):
+        """Identify the document script and return the smallest matching reader"""
+        try:
+            languages = self.script_detector.select_languages(img)
+            print(f"[INFO] Auto-selected OCR languages: {languages}")
+            return self.reader_pool.get(languages), languages
+        except Exception as e:
+            print(f"[WARNING] Script detection failed, using English reader: {e}")
+            return self.reader, self.languages
     
     def detect_file_type(self, file_path):
         """Detect file type from extension"""
         suffix = Path(file_path).suffix.lower()
-        if suffix in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp']:
+        if suffix in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif', '.webp']:
             return 'image'
         elif suffix == '.pdf':
             return 'pdf'
@@ -211,7 +607,7 @@ class AdvancedDocumentDetector:
     
     def detect_document_type(self, text_blocks):
         """Detect document type from text content"""
-        all_text = ' '.join([b['text'].lower() for b in text_blocks])
+        all_text = text_blocks.joined(lower=True)
         
         # Score each document type
         scores = {}
@@ -239,48 +635,146 @@ class AdvancedDocumentDetector:
         confidence = min(scores[doc_type] / 20.0, 1.0)
         return doc_type, max(confidence, 0.5)
     
-    def detect_document(self, file_path):
-        """Main detection method"""
+    def detect_document(self, file_path, profile=None, session=None):
+        """Main detection method - profile is 'fast', 'balanced', 'accurate' or a DetectionProfile"""
+        for event in self.detect_document_iter(file_path, profile, session):
+            if event.kind == DetectionEvent.RESULT:
+                return event.data['result']
+            if event.kind == DetectionEvent.ERROR:
+                return {'error': event.data['error']}
+        return {'error': 'Detection did not complete'}
+    
+    def detect_document_iter(self, file_path, profile=None, session=None, profiling=profiler.DEFAULT):
+        """Progressive detection - yields a DetectionEvent as each stage completes
+        
+        Callers can render partial results (region crop, first-pass text)
+        immediately, or stop iterating once they have what they need; the
+        remaining stages are then never run.
+        
+        With profiling enabled (see profiler.py) the whole request is
+        profiled - including the caller's work between events - and the
+        result carries a 'profile' summary with the artifact path.
+        profiling overrides the process-wide mode for this call ('sample',
+        'cprofile' or None).
+        
+        profile selects the speed/accuracy profile for this call (see
+        detection_profiles.py); None uses the detector's default.
+        
+        session identifies the user (any hashable, e.g. a Streamlit session
+        id). The duplicate index only reuses results scanned in the same
+        session, and is skipped when session is None.
+        """
+        file_type = self.detect_file_type(file_path)
+        detection_profile = self._profile(profile)
+        final = None
+        with profiler.profile_request('detect', mode=profiling) as request_profile:
+            for event in self._detect_stages(file_path, detection_profile, session):
+                if event.kind == DetectionEvent.TIMINGS:
+                    for stage, seconds in event.data['timings'].items():
+                        metrics.DETECTOR_STAGE_SECONDS.observe(seconds, stage=stage)
+                elif event.kind == DetectionEvent.RESULT:
+                    result = event.data['result']
+                    metrics.DETECTOR_DOCUMENTS.inc(file_type=file_type, document_type=result['document_type'],
+                                                   outcome='success')
+                    metrics.OCR_CONFIDENCE.observe(result['avg_ocr_confidence'])
+                    if result['ocr_fallback']:
+                        metrics.OCR_FALLBACKS.inc()
+                    metrics.DETECTOR_PEAK_MEMORY.set(result['peak_memory_mb'])
+                    if request_profile is not None:
+                        # Sent once the profile is written
+                        final = event
+                        continue
+                elif event.kind == DetectionEvent.ERROR:
+                    metrics.DETECTOR_DOCUMENTS.inc(file_type=file_type, document_type='none', outcome='error')
+                yield event
+        if final is not None:
+            final.data['result']['profile'] = request_profile.summary()
+            yield final
+    
+    def _detect_stages(self, file_path, profile=None, session=None):
+        profile = self._profile(profile)
+        timings = {}
+        total_start = time.perf_counter()
         file_path = Path(file_path)
         
         if not file_path.exists():
-            return {'error': f'File not found: {file_path}'}
+            yield DetectionEvent(DetectionEvent.ERROR, error=f'File not found: {file_path}')
+            return
         
         print(f"\n{'='*50}")
-        print(f"[INFO] Processing: {file_path.name}")
+        print(f"[INFO] Processing: {file_path.name} ({profile.name} profile)")
         
         file_type = self.detect_file_type(file_path)
         
         if file_type == 'image':
-            text_blocks, yolo_conf = self.process_image(file_path)
+            with PeakMemoryMonitor() as memory:
+                text_blocks, image_info = yield from self._iter_image(file_path, timings, profile, session)
+            print(f"[INFO] Peak process RSS: {memory.peak_mb:.1f} MB (+{memory.delta_mb:.1f} MB, "
+                  f"{memory.max_concurrent} concurrent requests)")
         elif file_type == 'pdf':
-            return {'error': 'PDF processing not implemented in this version'}
+            yield DetectionEvent(DetectionEvent.ERROR, error='PDF processing not implemented in this version')
+            return
         elif file_type == 'docx':
-            return {'error': 'DOCX processing not implemented in this version'}
+            yield DetectionEvent(DetectionEvent.ERROR, error='DOCX processing not implemented in this version')
+            return
         else:
-            return {'error': f'Unsupported file type: {file_type}'}
+            yield DetectionEvent(DetectionEvent.ERROR, error=f'Unsupported file type: {file_type}')
+            return
         
         if not text_blocks:
-            return {'error': 'No text extracted from document'}
+            yield DetectionEvent(DetectionEvent.ERROR, error='No text extracted from document')
+            return
+        
+        region_method = image_info.get('region_method')
+        region_conf = image_info.get('region_confidence')
         
         # Calculate average OCR confidence
-        avg_conf = sum(b['confidence'] for b in text_blocks) / len(text_blocks)
+        avg_conf = text_blocks.mean_confidence()
         
         # Detect document type
+        start = time.perf_counter()
         doc_type, type_conf = self.detect_document_type(text_blocks)
+        timings['classify'] = time.perf_counter() - start
+        yield DetectionEvent(DetectionEvent.DOCUMENT_TYPE, document_type=doc_type, confidence=float(type_conf))
         
         print(f"[SUCCESS] Document Type: {doc_type.upper()} (confidence: {type_conf:.1%})")
         print(f"{'='*50}\n")
         
-        return {
+        result = {
             'document_type': doc_type,
             'type_confidence': float(type_conf),
             'text_blocks': text_blocks,
             'avg_ocr_confidence': float(avg_conf),
             'num_blocks': len(text_blocks),
             'file_type': file_type,
-            'yolo_confidence': float(yolo_conf) if yolo_conf is not None else None
+            'region_method': region_method,
+            'region_confidence': float(region_conf) if region_conf is not None else None,
+            'region_box': image_info.get('region_box'),
+            'yolo_confidence': float(region_conf) if region_method == 'yolo' else None,
+            'languages': image_info.get('languages', self.languages),
+            'ocr_passes': image_info.get('ocr_passes', 0),
+            'ocr_fallback': image_info.get('ocr_fallback', False),
+            'accepted_pass': image_info.get('accepted_pass'),
+            'pages': image_info.get('pages', 1),
+            'rotation': image_info.get('rotation', 0),
+            'skew': image_info.get('skew', 0.0),
+            'duplicate_distance': image_info.get('duplicate_distance'),
+            'detection_profile': profile.name,
+            'input_scale': image_info.get('input_scale', 1.0),
+            'peak_memory_mb': memory.peak_mb,
+            'memory_delta_mb': memory.delta_mb,
+            'memory_concurrent_requests': memory.max_concurrent,
+            'timings': timings
         }
+        
+        start = time.perf_counter()
+        fields = self.extract_fields(result)
+        timings['fields'] = time.perf_counter() - start
+        yield DetectionEvent(DetectionEvent.FIELDS, fields=fields)
+        
+        timings['total'] = time.perf_counter() - total_start
+        yield DetectionEvent(DetectionEvent.TIMINGS, timings=dict(timings))
+        yield DetectionEvent(DetectionEvent.RESULT, result=result)
     
     def extract_fields(self, detection_result):
         """Extract specific fields based on document type"""
@@ -288,7 +782,7 @@ class AdvancedDocumentDetector:
             return {}
             
         doc_type = detection_result.get('document_type')
-        text_blocks = detection_result.get('text_blocks', [])
+        text_blocks = detection_result.get('text_blocks', TextBlocks())
         
         if doc_type == 'aadhaar':
             return self._extract_aadhaar_fields(text_blocks)
@@ -301,7 +795,7 @@ class AdvancedDocumentDetector:
     def _extract_aadhaar_fields(self, text_blocks):
         """Extract Aadhaar-specific fields"""
         fields = {}
-        all_text = ' '.join([b['text'] for b in text_blocks])
+        all_text = text_blocks.joined()
         
         # Aadhaar number (12 digits)
         match = re.search(r'\b\d{4}\s?\d{4}\s?\d{4}\b', all_text)
@@ -319,9 +813,9 @@ class AdvancedDocumentDetector:
             fields['gender'] = match.group().title()
         
         # Name (heuristic: text block with 2-4 words, no digits)
-        for block in text_blocks:
-            text = block['text'].strip()
-            if block['confidence'] > 0.6 and 10 < len(text) < 50:
+        for i in np.flatnonzero(text_blocks.confidence > 0.6):
+            text = text_blocks.texts[i].strip()
+            if 10 < len(text) < 50:
                 if not any(c.isdigit() for c in text):
                     words = text.split()
                     if 2 <= len(words) <= 4:
@@ -333,7 +827,7 @@ class AdvancedDocumentDetector:
     def _extract_passport_fields(self, text_blocks):
         """Extract Passport-specific fields"""
         fields = {}
-        all_text = ' '.join([b['text'] for b in text_blocks])
+        all_text = text_blocks.joined()
         
         # Passport number
         match = re.search(r'\b[A-Z]\d{7,8}\b', all_text)
@@ -346,10 +840,11 @@ class AdvancedDocumentDetector:
             fields['dob'] = match.group()
         
         # Surname
-        for i, block in enumerate(text_blocks):
-            if 'surname' in block['text'].lower():
-                if i + 1 < len(text_blocks):
-                    fields['surname'] = text_blocks[i + 1]['text']
+        texts = text_blocks.texts
+        for i, text in enumerate(texts):
+            if 'surname' in text.lower():
+                if i + 1 < len(texts):
+                    fields['surname'] = texts[i + 1]
                     break
         
         return fields
@@ -357,7 +852,7 @@ class AdvancedDocumentDetector:
     def _extract_pan_fields(self, text_blocks):
         """Extract PAN-specific fields"""
         fields = {}
-        all_text = ' '.join([b['text'] for b in text_blocks])
+        all_text = text_blocks.joined()
         
         # PAN number (format: ABCDE1234F)
         match = re.search(r'\b[A-Z]{5}\d{4}[A-Z]\b', all_text)
@@ -365,10 +860,10 @@ class AdvancedDocumentDetector:
             fields['pan_number'] = match.group()
         
         # Name
-        for i, block in enumerate(text_blocks):
-            text = block['text'].lower()
-            if 'name' in text and i + 1 < len(text_blocks):
-                fields['name'] = text_blocks[i + 1]['text']
+        texts = text_blocks.texts
+        for i, text in enumerate(texts):
+            if 'name' in text.lower() and i + 1 < len(texts):
+                fields['name'] = texts[i + 1]
                 break
         
         # Date of Birth
@@ -0,0 +1,100 @@
+"""Classical Document Boundary Detection with Perspective Correction"""
+import cv2
+import numpy as np
+
+
+class DocumentLocator:
+    """Find a card/page quadrilateral with edges + contours and rectify it"""
+
+    def __init__(self, work_size=500, min_area_ratio=0.2, max_area_ratio=0.97, min_confidence=0.6):
+        self.work_size = work_size
+        self.min_area_ratio = min_area_ratio
+        self.max_area_ratio = max_area_ratio
+        self.min_confidence = min_confidence
+
+    def locate(self, img):
+        """Return (warped, confidence, quad), or (None, confidence, None) if no confident quad"""
+        quad, conf = self.find_quad(img)
+        if quad is None or conf < self.min_confidence:
+            return None, conf, None
+        return self.warp(img, quad), conf, quad
+
+    def find_quad(self, img):
+        """Find the best document quadrilateral in full-resolution coordinates"""
+        h, w = img.shape[:2]
+        scale = min(1.0, self.work_size / float(max(h, w)))
+
+        # Work on a downscaled copy - the boundary does not need full resolution
+        if scale < 1.0:
+            small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        else:
+            small = img
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+
+        # Canny thresholds adapted to the image brightness
+        median = float(np.median(gray))
+        lower = int(max(0, 0.66 * median))
+        upper = int(min(255, 1.33 * median))
+        edges = cv2.Canny(gray, lower, max(upper, lower + 1))
+        edges = cv2.dilate(edges, np.ones((3, 3), np.uint8), iterations=1)
+
+        contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        image_area = float(gray.shape[0] * gray.shape[1])
+
+        best_quad, best_score = None, 0.0
+        for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:10]:
+            area = cv2.contourArea(contour)
+            if area < self.min_area_ratio * image_area:
+                break
+
+            peri = cv2.arcLength(contour, True)
+            approx = cv2.approxPolyDP(contour, 0.02 * peri, True)
+            if len(approx) != 4 or not cv2.isContourConvex(approx):
+                continue
+
+            quad = approx.reshape(4, 2).astype(np.float32)
+            quad_area = cv2.contourArea(quad)
+            # Quads hugging the image border are the frame, not a document
+            if quad_area <= 0 or quad_area > self.max_area_ratio * image_area:
+                continue
+
+            score = self._score_quad(quad) * min(area / quad_area, 1.0)
+            if score > best_score:
+                best_quad, best_score = quad, score
+
+        if best_quad is None:
+            return None, 0.0
+        return self._order_points(best_quad / scale), best_score
+
+    def warp(self, img, quad):
+        """Perspective-warp the quadrilateral to an upright rectangle"""
+        return cv2.warpPerspective(img, *self.warp_params(quad))
+
+    def warp_params(self, quad):
+        """Return (matrix, (width, height)) mapping the quad to an upright rectangle"""
+        tl, tr, br, bl = quad
+        width = int(round(max(np.linalg.norm(br - bl), np.linalg.norm(tr - tl))))
+        height = int(round(max(np.linalg.norm(tr - br), np.linalg.norm(tl - bl))))
+        dst = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32)
+        matrix = cv2.getPerspectiveTransform(quad.astype(np.float32), dst)
+        return matrix, (max(width, 1), max(height, 1))
+
+    def _score_quad(self, quad):
+        """Score how close the quad corners are to right angles (1.0 = rectangle)"""
+        cosines = []
+        for i in range(4):
+            a, b, c = quad[i - 1], quad[i], quad[(i + 1) % 4]
+            v1, v2 = a - b, c - b
+            denom = np.linalg.norm(v1) * np.linalg.norm(v2)
+            if denom == 0:
+                return 0.0
+            cosines.append(abs(float(np.dot(v1, v2)) / denom))
+        return 1.0 - max(cosines)
+
+    def _order_points(self, pts):
+        """Order points as top-left, top-right, bottom-right, bottom-left"""
+        s = pts.sum(axis=1)
+        d = np.diff(pts, axis=1).ravel()
+        return np.array([pts[np.argmin(s)], pts[np.argmin(d)],
+                         pts[np.argmax(s)], pts[np.argmax(d)]], dtype=np.float32)
@@ -0,0 +1,170 @@
+"""Perceptual-hash Index for near-duplicate documents"""
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def _bits_to_int(bits):
+    return int(''.join('1' if b else '0' for b in bits.ravel()), 2)
+
+
+def _gray(img):
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+
+
+def phash(img):
+    """64-bit DCT hash: low-frequency 8x8 DCT coefficients above their median"""
+    small = cv2.resize(_gray(img), (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8]
+    # Median of the 63 AC coefficients - only the DC term is excluded
+    return _bits_to_int(low > np.median(low.ravel()[1:]))
+
+
+def dhash(img):
+    """64-bit gradient hash: each pixel brighter than its right neighbour"""
+    small = cv2.resize(_gray(img), (9, 8), interpolation=cv2.INTER_AREA)
+    return _bits_to_int(small[:, 1:] > small[:, :-1])
+
+
+def signature(img, size=(192, 120)):
+    """Contrast-normalized high-pass thumbnail (uint8) for pixel-level confirmation
+
+    Blurring absorbs small misalignment and noise; subtracting the local
+    mean and dividing by the spread removes lighting differences, so
+    re-photographs of one document stay close while different text on
+    the same template does not.
+    """
+    small = cv2.resize(_gray(img), size, interpolation=cv2.INTER_AREA).astype(np.float32)
+    small = cv2.GaussianBlur(small, (3, 3), 0)
+    detail = small - cv2.blur(small, (15, 15))
+    detail /= max(float(detail.std()), 1e-3)
+    return np.clip(detail * 32 + 128, 0, 255).astype(np.uint8)
+
+
+def signature_distance(a, b, cell=12):
+    """Largest per-cell mean difference between two signatures, in standard deviations"""
+    diff = np.abs(a.astype(np.float32) - b.astype(np.float32)) / 32.0
+    h, w = diff.shape[0] // cell * cell, diff.shape[1] // cell * cell
+    cells = diff[:h, :w].reshape(h // cell, cell, w // cell, cell).mean(axis=(1, 3))
+    return float(cells.max())
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes for Hamming-radius search"""
+
+    def __init__(self):
+        self.root = None  # [hash, key, {distance: child}]
+        self.size = 0
+
+    def add(self, value, key):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, key, {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(value, node[0])
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, key, {}]
+                return
+            node = child
+
+    def search(self, value, radius):
+        """[(distance, key)] for every hash within radius, closest first"""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            d = hamming(value, node[0])
+            if d <= radius:
+                found.append((d, node[1]))
+            # Triangle inequality: only subtrees at d +- radius can match
+            for edge, child in node[2].items():
+                if d - radius <= edge <= d + radius:
+                    stack.append(child)
+        return sorted(found, key=lambda f: f[0])
+
+
+class DuplicateIndex:
+    """Recent detection results keyed by perceptual hash of the document region
+
+    A 64-bit hash cannot tell apart cards printed on the same template for
+    different people, so hashes only find candidates: a pHash within
+    threshold bits (BK-tree search), then the dHash and aspect ratio, and
+    finally a pixel-level check - every cell of the normalized signature
+    must differ by at most max_cell_diff. Entries only match within their
+    scope (callers include the user session, so results never cross
+    users). The oldest entries are evicted once max_entries is reached
+    (the tree is rebuilt from the survivors).
+    """
+
+    def __init__(self, threshold=6, max_entries=500, max_aspect_change=0.1, max_cell_diff=0.4):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_aspect_change = max_aspect_change
+        self.max_cell_diff = max_cell_diff
+        self.entries = OrderedDict()  # key -> (phash, dhash, aspect, signature, scope, value)
+        self.tree = BKTree()
+        self.lookups = 0
+        self.hits = 0
+        self.rejected = 0  # hash matches refused by the pixel check
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    def fingerprint(self, img):
+        h, w = img.shape[:2]
+        return phash(img), dhash(img), w / float(max(h, 1)), signature(img)
+
+    def lookup(self, fingerprint, scope=None):
+        """Return (value, distance) of the closest confirmed match in scope, else None"""
+        p, d, aspect, sig = fingerprint
+        with self._lock:
+            self.lookups += 1
+            for distance, key in self.tree.search(p, self.threshold):
+                entry = self.entries.get(key)
+                if entry is None or entry[4] != scope:
+                    continue
+                if hamming(d, entry[1]) > self.threshold:
+                    continue
+                if abs(aspect - entry[2]) > self.max_aspect_change * entry[2]:
+                    continue
+                if signature_distance(sig, entry[3]) > self.max_cell_diff:
+                    self.rejected += 1
+                    continue
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return entry[5], distance
+        return None
+
+    def add(self, fingerprint, value, scope=None):
+        p, d, aspect, sig = fingerprint
+        with self._lock:
+            key = self._next_key
+            self._next_key += 1
+            self.entries[key] = (p, d, aspect, sig, scope, value)
+            self.tree.add(p, key)
+            if len(self.entries) > self.max_entries:
+                # BK-trees do not support deletion - drop the oldest half and rebuild
+                for _ in range(len(self.entries) // 2):
+                    self.entries.popitem(last=False)
+                self.tree = BKTree()
+                for k, entry in self.entries.items():
+                    self.tree.add(entry[0], k)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self.entries),
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_rate': self.hits / float(self.lookups) if self.lookups else 0.0,
+                'rejected': self.rejected,
+                'threshold': self.threshold
+            }
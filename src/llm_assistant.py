@@ -1,18 +1,41 @@
 """LLM Assistant for Visa Queries"""
-import google.generativeai as genai
+import functools
+import time
 from dotenv import load_dotenv
-import os
+from conversation_memory import ConversationMemory
+from prompt_builder import DocumentPromptBuilder
+from llm_backends import TokenCounter, create_backend, prompt_key
+from single_flight import SingleFlight
+from visa_store import normalize_corridor
+import metrics
+import profiler
 
 load_dotenv()
 
+# Shared by every assistant in the process, so concurrent users coalesce too
+LLM_FLIGHTS = SingleFlight()
+
+
+def profiled(label):
+    """Profile the call in self.profile_mode; the summary lands in self.last_profile"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with profiler.profile_request(label, mode=self.profile_mode) as profile:
+                result = method(self, *args, **kwargs)
+            if profile is not None:
+                self.last_profile = profile.summary()
+            return result
+        return wrapper
+    return decorator
+
+
 class VisaAssistant:
-    def __init__(self):
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in .env file")
-        
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('models/gemini-2.5-flash')
+    def __init__(self, memory_tokens=2000, analysis_tokens=1000, backend=None, single_flight=None,
+                 profile_mode=profiler.DEFAULT):
+        # Backend comes from VISAFLOW_LLM_BACKEND unless given (gemini, replay, stub)
+        self.backend = backend or create_backend()
+        self.single_flight = single_flight or LLM_FLIGHTS
         
         self.system_prompt = """You are a visa and immigration expert assistant. 
         You help people understand visa requirements, application processes, and documentation needs.
@@ -25,9 +48,82 @@ class VisaAssistant:
         
         Always be helpful, accurate, and ask clarifying questions if needed."""
         
-    def get_visa_requirements(self, from_country, to_country, purpose):
-        """Get visa requirements for travel between countries"""
-        prompt = f"""{self.system_prompt}
+        self.token_counter = TokenCounter(self.backend)
+        self.memory = ConversationMemory(self.count_tokens, self._summarize, max_tokens=memory_tokens)
+        self._chat_session = None
+        self.prompt_builder = DocumentPromptBuilder(self.count_tokens, token_budget=analysis_tokens)
+        self.last_prompt_stats = None
+        self.last_profile = None
+        # 'sample', 'cprofile', None (off) or profiler.DEFAULT (process-wide mode)
+        self.profile_mode = profile_mode
+    
+    def count_tokens(self, text):
+        """Token count from a local estimate calibrated once against the model's tokenizer"""
+        return self.token_counter(text)
+    
+    def _generate(self, prompt, operation):
+        """backend.generate with latency, outcome and token metrics"""
+        start = time.perf_counter()
+        try:
+            response = self.backend.generate(prompt)
+        except Exception:
+            self._record(operation, start, 'error')
+            raise
+        self._record(operation, start, 'success', response)
+        return response
+    
+    def _stream(self, prompt, operation):
+        """backend.stream with the same metrics (latency is to the last chunk)"""
+        start = time.perf_counter()
+        try:
+            yield from self.backend.stream(prompt)
+        except Exception:
+            self._record(operation, start, 'error')
+            raise
+        self._record(operation, start, 'success')
+    
+    def _record(self, operation, start, outcome, response=None):
+        backend = getattr(self.backend, 'name', 'unknown')
+        metrics.LLM_SECONDS.observe(time.perf_counter() - start, operation=operation, backend=backend)
+        metrics.LLM_REQUESTS.inc(operation=operation, backend=backend, outcome=outcome)
+        if response is not None:
+            for direction, tokens in (('prompt', response.prompt_tokens), ('output', response.output_tokens)):
+                if tokens:
+                    metrics.LLM_TOKENS.inc(tokens, operation=operation, direction=direction)
+    
+    def _coalesced(self, operation, key, prompt):
+        """_generate, shared with identical requests already in flight"""
+        response, shared = self.single_flight.do((operation, self.backend.name) + key,
+                                                 lambda: self._generate(prompt, operation))
+        if shared:
+            print(f"[INFO] Joined an identical in-flight {operation} request")
+            metrics.LLM_COALESCED.inc(operation=operation)
+        return response
+    
+    def _summarize(self, previous_summary, turns, max_tokens):
+        """Fold evicted turns into the rolling conversation summary"""
+        transcript = "\n".join(f"{t['role'].title()}: {t['content']}" for t in turns)
+        prompt = f"""Update the summary of a visa-assistance conversation.
+
+Current summary:
+{previous_summary or "(none)"}
+
+New turns:
+{transcript}
+
+Write an updated summary in under {max_tokens} tokens. Keep countries, visa types,
+dates, documents and any facts the user shared about themselves."""
+        
+        response = self._generate(prompt, 'summarize')
+        return response.text.strip()
+    
+    def reset_conversation(self):
+        """Forget the conversation history"""
+        self.memory.clear()
+        self._chat_session = None
+        
+    def _requirements_prompt(self, from_country, to_country, purpose):
+        return f"""{self.system_prompt}
 
 Question: What are the visa requirements for a {purpose} trip from {from_country} to {to_country}?
 
@@ -39,40 +135,92 @@ Provide:
 5. Important notes
 
 Be concise but comprehensive."""
-
-        response = self.model.generate_content(prompt)
+    
+    @profiled('requirements')
+    def get_visa_requirements(self, from_country, to_country, purpose):
+        """Get visa requirements for travel between countries
+        
+        Concurrent requests for the same corridor share one LLM call.
+        """
+        prompt = self._requirements_prompt(from_country, to_country, purpose)
+        response = self._coalesced('requirements', normalize_corridor(from_country, to_country, purpose), prompt)
         return response.text
     
-    def analyze_document(self, extracted_text, document_type="passport"):
-        """Analyze extracted document text for completeness"""
-        text_summary = "\n".join([item['text'] for item in extracted_text['full_text'][:10]])
+    def stream_visa_requirements(self, from_country, to_country, purpose):
+        """Yield the visa requirements answer as text chunks arrive
         
-        prompt = f"""{self.system_prompt}
-
-I've extracted the following text from a {document_type}:
-
-{text_summary}
-
-Please analyze:
+        Concurrent streams for the same corridor share one LLM stream; late
+        joiners receive the chunks so far, then follow it live.
+        """
+        prompt = self._requirements_prompt(from_country, to_country, purpose)
+        key = ('requirements_stream', self.backend.name) + normalize_corridor(from_country, to_country, purpose)
+        with profiler.profile_request('requirements_stream', mode=self.profile_mode) as profile:
+            yield from self.single_flight.stream(
+                key, lambda: self._stream(prompt, 'requirements_stream'),
+                on_shared=lambda: metrics.LLM_COALESCED.inc(operation='requirements_stream'))
+        if profile is not None:
+            self.last_profile = profile.summary()
+    
+    @profiled('analyze_document')
+    def analyze_document(self, detection_result, fields=None, token_budget=None):
+        """Analyze a detection result for completeness
+        
+        Sends the structured fields, document type and the deduplicated
+        high-confidence OCR text packed into a token budget. Budget use is
+        kept in self.last_prompt_stats.
+        """
+        instructions = """Please analyze:
 1. What information is present?
 2. What critical information might be missing?
 3. Is this sufficient for visa applications?
 4. Any concerns or recommendations?
 
 Be specific and practical."""
+        
+        overhead = self.count_tokens(f"{self.system_prompt}\n\n{instructions}") + 20
+        document_section, stats = self.prompt_builder.build(
+            detection_result, fields or {}, overhead_tokens=overhead, token_budget=token_budget)
+        self.last_prompt_stats = stats
+        print(f"[INFO] Analysis prompt: {stats['prompt_tokens']}/{stats['token_budget']} tokens, "
+              f"{stats['blocks_used']}/{stats['blocks_total']} text blocks")
+        
+        prompt = f"""{self.system_prompt}
+
+I've extracted the following from a scanned document:
+
+{document_section}
 
-        response = self.model.generate_content(prompt)
+{instructions}"""
+
+        # Identical documents analyzed concurrently (e.g. a double click) share one call
+        response = self._coalesced('analyze_document', (prompt_key(prompt),), prompt)
         return response.text
     
+    @profiled('chat')
     def chat(self, user_message, context=""):
-        """General chat about visa/immigration queries"""
-        prompt = f"""{self.system_prompt}
-
-{context}
+        """General chat about visa/immigration queries, with conversation memory"""
+        message = f"""{context}
 
 User question: {user_message}
 
-Provide a helpful, accurate response."""
-
-        response = self.model.generate_content(prompt)
+Provide a helpful, accurate response.""" if context else user_message
+        
+        # Reuse the chat session until the memory is compacted
+        if self._chat_session is None:
+            # The system prompt travels as a system instruction, not inside every turn
+            self._chat_session = self.backend.start_chat(
+                self.memory.history(), system_instruction=self.system_prompt)
+        
+        start = time.perf_counter()
+        try:
+            response = self._chat_session.send_message(message)
+        except Exception:
+            self._record('chat', start, 'error')
+            raise
+        self._record('chat', start, 'success', response)
+        
+        compacted = self.memory.add('user', message)
+        if self.memory.add('assistant', response.text) or compacted:
+            # Older turns were summarized - rebuild the session from memory next turn
+            self._chat_session = None
         return response.text
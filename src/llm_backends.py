@@ -0,0 +1,340 @@
+"""Pluggable LLM Backends - Gemini, local replay, stub server, recorder
+
+Select with environment variables:
+    VISAFLOW_LLM_BACKEND      gemini (default) | replay | stub
+    VISAFLOW_LLM_RECORDINGS   JSONL recordings file (default outputs/llm_recordings.jsonl)
+    VISAFLOW_LLM_RECORD       1 to record Gemini responses into the recordings file
+    VISAFLOW_LLM_STUB_URL     stub server address (default http://127.0.0.1:8765)
+    VISAFLOW_REPLAY_SPEED     replay time scale, 0 disables sleeping (default 1.0)
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import urllib.request
+from collections import Counter, OrderedDict
+
+from script_detector import SCRIPT_RANGES
+
+MODEL_NAME = 'models/gemini-2.5-flash'
+DEFAULT_RECORDINGS = 'outputs/llm_recordings.jsonl'
+
+
+def prompt_key(prompt):
+    """Stable key for a prompt, insensitive to whitespace differences"""
+    return hashlib.sha256(re.sub(r'\s+', ' ', prompt).strip().encode('utf-8')).hexdigest()
+
+
+# Tokens per character before calibration: ~4 characters per token for Latin
+# text, while Indic scripts split into far more tokens per character
+DEFAULT_TOKENS_PER_CHAR = {'latin': 0.25}
+DEFAULT_TOKENS_PER_CHAR.update({script: 1.0 for script in SCRIPT_RANGES})
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def script_counts(text):
+    """Characters per script - SCRIPT_RANGES blocks, everything else counts as 'latin'"""
+    if text.isascii():
+        return Counter({'latin': len(text)})
+    counts = Counter()
+    for char in text:
+        code = ord(char)
+        for script, (lo, hi) in SCRIPT_RANGES.items():
+            if lo <= code <= hi:
+                counts[script] += 1
+                break
+        else:
+            counts['latin'] += 1
+    return counts
+
+
+class TokenCounter:
+    """Local token estimate calibrated per script against the backend's tokenizer
+
+    Tokens per character differ several-fold between Latin and Indic
+    scripts, so each script has its own ratio. The first text of at least
+    calibration_chars that is mostly (dominant_share) one script is counted
+    remotely and fixes that script's ratio - at most one round trip per
+    script; every other count is local. Counts are memoized in a bounded
+    LRU.
+    """
+
+    def __init__(self, backend, calibration_chars=200, max_entries=1024, dominant_share=0.8):
+        self.backend = backend
+        self.calibration_chars = calibration_chars
+        self.max_entries = max_entries
+        self.dominant_share = dominant_share
+        self.tokens_per_char = dict(DEFAULT_TOKENS_PER_CHAR)
+        self.calibrated = set()
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, text):
+        with self._lock:
+            if text in self._counts:
+                self._counts.move_to_end(text)
+                return self._counts[text]
+        counts = script_counts(text)
+        if len(text) >= self.calibration_chars:
+            script, chars = counts.most_common(1)[0]
+            if script not in self.calibrated and chars >= self.dominant_share * len(text):
+                self._calibrate(script, text, counts)
+        count = max(1, int(round(sum(chars * self.tokens_per_char[script] for script, chars in counts.items()))))
+        with self._lock:
+            self._counts[text] = count
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return count
+
+    def _calibrate(self, script, text, counts):
+        """Fit the script's ratio to a remote count, crediting the other scripts at their current ratios"""
+        self.calibrated.add(script)
+        try:
+            tokens = self.backend.count_tokens(text)
+            others = sum(chars * self.tokens_per_char[s] for s, chars in counts.items() if s != script)
+            self.tokens_per_char[script] = max(tokens - others, 1) / float(counts[script])
+            print(f"[INFO] Token estimate calibrated for {script}: {self.tokens_per_char[script]:.2f} tokens/char")
+        except Exception as e:
+            print(f"[WARNING] Token count failed, using the uncalibrated {script} estimate: {e}")
+
+
+class LLMResponse:
+    """Generation result - mirrors the .text attribute of Gemini responses"""
+
+    def __init__(self, text, prompt_tokens=None, output_tokens=None):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+
+
+class LLMBackend:
+    """Interface every backend implements"""
+    name = 'base'
+
+    def generate(self, prompt):
+        """Return an LLMResponse for a single prompt"""
+        raise NotImplementedError
+
+    def stream(self, prompt):
+        """Yield text chunks as they are produced"""
+        yield self.generate(prompt).text
+
+    def count_tokens(self, text):
+        return estimate_tokens(text)
+
+    def start_chat(self, history, system_instruction=None):
+        """Return a chat session with send_message(text) -> LLMResponse"""
+        return PromptChat(self, history, system_instruction)
+
+
+class PromptChat:
+    """Chat session for backends without native sessions - flattens history into a prompt"""
+
+    def __init__(self, backend, history, system_instruction=None):
+        self.backend = backend
+        self.history = list(history)
+        self.system_instruction = system_instruction
+
+    def send_message(self, text):
+        lines = [self.system_instruction] if self.system_instruction else []
+        for turn in self.history:
+            lines.append(f"{turn['role']}: {' '.join(turn['parts'])}")
+        lines.append(f"user: {text}")
+        response = self.backend.generate("\n\n".join(lines))
+        self.history.append({'role': 'user', 'parts': [text]})
+        self.history.append({'role': 'model', 'parts': [response.text]})
+        return response
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini via google-generativeai"""
+    name = 'gemini'
+
+    def __init__(self, model_name=MODEL_NAME, api_key=None):
+        import google.generativeai as genai
+
+        api_key = api_key or os.getenv('GEMINI_API_KEY')
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found in .env file")
+
+        genai.configure(api_key=api_key)
+        self.genai = genai
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self._chat_models = {}
+
+    def generate(self, prompt):
+        response = self.model.generate_content(prompt)
+        return self._wrap(response)
+
+    def stream(self, prompt):
+        for chunk in self.model.generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+    def count_tokens(self, text):
+        return self.model.count_tokens(text).total_tokens
+
+    def start_chat(self, history, system_instruction=None):
+        if system_instruction not in self._chat_models:
+            self._chat_models[system_instruction] = self.genai.GenerativeModel(
+                self.model_name, system_instruction=system_instruction)
+        return GeminiChat(self._chat_models[system_instruction].start_chat(history=history))
+
+    @staticmethod
+    def _wrap(response):
+        usage = getattr(response, 'usage_metadata', None)
+        return LLMResponse(
+            response.text,
+            prompt_tokens=getattr(usage, 'prompt_token_count', None),
+            output_tokens=getattr(usage, 'candidates_token_count', None)
+        )
+
+
+class GeminiChat:
+    """Native Gemini chat session - the system instruction is not resent as text"""
+
+    def __init__(self, session):
+        self.session = session
+
+    def send_message(self, text):
+        return GeminiBackend._wrap(self.session.send_message(text))
+
+
+class ReplayBackend(LLMBackend):
+    """Replay recorded responses with their recorded latency and streaming timing
+
+    Unknown prompts get a deterministic placeholder answer with a synthetic
+    latency model (time to first token + constant token rate), so offline
+    load tests always have something realistic to wait on.
+    """
+    name = 'replay'
+
+    def __init__(self, recordings_path=DEFAULT_RECORDINGS, time_scale=1.0,
+                 first_token_s=0.6, tokens_per_s=60.0):
+        self.time_scale = time_scale
+        self.first_token_s = first_token_s
+        self.tokens_per_s = tokens_per_s
+        self.recordings = {}
+        if recordings_path and os.path.exists(recordings_path):
+            with open(recordings_path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.recordings[record['key']] = record
+        print(f"[INFO] Replay backend loaded {len(self.recordings)} recordings")
+
+    def generate(self, prompt):
+        record = self._lookup(prompt)
+        self._sleep(record['chunks'][-1][0] if record['chunks'] else 0.0)
+        text = ''.join(chunk for _, chunk in record['chunks'])
+        return LLMResponse(text, record.get('prompt_tokens'), record.get('output_tokens'))
+
+    def stream(self, prompt):
+        record = self._lookup(prompt)
+        elapsed = 0.0
+        for offset, chunk in record['chunks']:
+            self._sleep(offset - elapsed)
+            elapsed = offset
+            yield chunk
+
+    def _lookup(self, prompt):
+        record = self.recordings.get(prompt_key(prompt))
+        if record is not None:
+            return record
+
+        # Synthetic response: split into ~token-sized chunks on the latency model
+        text = ("[Offline replay] No recorded response for this prompt. "
+                "This placeholder stands in for the model answer so that timing, "
+                "caching and streaming can be exercised without network access.")
+        words = text.split(' ')
+        step = 1.0 / self.tokens_per_s
+        chunks = [[self.first_token_s + i * step, w + (' ' if i < len(words) - 1 else '')]
+                  for i, w in enumerate(words)]
+        return {'chunks': chunks, 'prompt_tokens': estimate_tokens(prompt), 'output_tokens': len(words)}
+
+    def _sleep(self, seconds):
+        if self.time_scale and seconds > 0:
+            time.sleep(seconds * self.time_scale)
+
+
+class RecordingBackend(LLMBackend):
+    """Wrap a backend and append every response, with chunk timings, to a JSONL file"""
+    name = 'recording'
+
+    def __init__(self, inner, path=DEFAULT_RECORDINGS):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def generate(self, prompt):
+        text = ''.join(self.stream(prompt))
+        return LLMResponse(text, self.inner.count_tokens(prompt), self.inner.count_tokens(text))
+
+    def stream(self, prompt):
+        start = time.perf_counter()
+        chunks = []
+        for chunk in self.inner.stream(prompt):
+            chunks.append([round(time.perf_counter() - start, 4), chunk])
+            yield chunk
+        self._write({'key': prompt_key(prompt), 'prompt_preview': prompt[:200], 'chunks': chunks})
+
+    def count_tokens(self, text):
+        return self.inner.count_tokens(text)
+
+    def _write(self, record):
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+class StubServerBackend(LLMBackend):
+    """Client for llm_stub_server.py - same replay behaviour, over local HTTP"""
+    name = 'stub'
+
+    def __init__(self, url='http://127.0.0.1:8765', timeout=60):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def generate(self, prompt):
+        data = self._post('/v1/generate', {'prompt': prompt})
+        with data as response:
+            body = json.loads(response.read().decode('utf-8'))
+        return LLMResponse(body['text'], body.get('prompt_tokens'), body.get('output_tokens'))
+
+    def stream(self, prompt):
+        with self._post('/v1/stream', {'prompt': prompt}) as response:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line.decode('utf-8'))['text']
+
+    def _post(self, path, payload):
+        request = urllib.request.Request(
+            self.url + path,
+            data=json.dumps(payload).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}
+        )
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+
+def create_backend(name=None):
+    """Build the backend selected by VISAFLOW_LLM_BACKEND (or name)"""
+    name = (name or os.getenv('VISAFLOW_LLM_BACKEND', 'gemini')).lower()
+    recordings = os.getenv('VISAFLOW_LLM_RECORDINGS', DEFAULT_RECORDINGS)
+
+    if name == 'replay':
+        return ReplayBackend(recordings, time_scale=float(os.getenv('VISAFLOW_REPLAY_SPEED', '1.0')))
+    if name == 'stub':
+        return StubServerBackend(os.getenv('VISAFLOW_LLM_STUB_URL', 'http://127.0.0.1:8765'))
+    if name == 'gemini':
+        backend = GeminiBackend()
+        if os.getenv('VISAFLOW_LLM_RECORD') == '1':
+            print(f"[INFO] Recording Gemini responses to {recordings}")
+            return RecordingBackend(backend, recordings)
+        return backend
+    raise ValueError(f"Unknown LLM backend: {name}")
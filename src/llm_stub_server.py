@@ -0,0 +1,75 @@
+"""Local LLM Stub Server - serves recorded responses with realistic timing
+
+Run:
+    python src/llm_stub_server.py --recordings outputs/llm_recordings.jsonl --port 8765
+
+Then start the app with VISAFLOW_LLM_BACKEND=stub.
+"""
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_backends import DEFAULT_RECORDINGS, ReplayBackend
+
+
+def make_handler(backend):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            prompt = json.loads(self.rfile.read(length) or b'{}').get('prompt', '')
+
+            if self.path == '/v1/generate':
+                response = backend.generate(prompt)
+                body = json.dumps({
+                    'text': response.text,
+                    'prompt_tokens': response.prompt_tokens,
+                    'output_tokens': response.output_tokens
+                }).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            elif self.path == '/v1/stream':
+                # Newline-delimited JSON chunks over chunked transfer encoding
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for chunk in backend.stream(prompt):
+                    self._write_chunk(json.dumps({'text': chunk}).encode('utf-8') + b'\n')
+                self._write_chunk(b'')
+            else:
+                self.send_error(404)
+
+        def _write_chunk(self, data):
+            self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded LLM responses locally")
+    parser.add_argument('--recordings', default=DEFAULT_RECORDINGS)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--speed', type=float, default=1.0, help="Latency scale, 0 = no delay")
+    args = parser.parse_args()
+
+    backend = ReplayBackend(args.recordings, time_scale=args.speed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(backend))
+    print(f"[INFO] LLM stub server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Peak process memory measurement around a block of work"""
+import os
+import sys
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss_bytes():
+    """Current resident set size of this process (0 if unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        pass
+    if resource is not None:
+        # ru_maxrss is a high-water mark (KB on Linux, bytes on macOS) - best we have
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == 'darwin' else rss * 1024
+    return 0
+
+
+class RssSampler:
+    """One background thread sampling RSS for every active monitor
+
+    The thread runs only while at least one monitor is registered, so
+    concurrent requests share a single sampler instead of one each.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._monitors = set()
+        self._lock = threading.Lock()
+        self._stop = None
+
+    def register(self, monitor):
+        with self._lock:
+            self._monitors.add(monitor)
+            for m in self._monitors:
+                m.max_concurrent = max(m.max_concurrent, len(self._monitors))
+            if self._stop is None:
+                self._stop = threading.Event()
+                threading.Thread(target=self._run, args=(self._stop,), name='rss-sampler', daemon=True).start()
+
+    def unregister(self, monitor):
+        with self._lock:
+            self._monitors.discard(monitor)
+            if not self._monitors and self._stop is not None:
+                self._stop.set()
+                self._stop = None
+
+    def _run(self, stop):
+        while not stop.wait(self.interval):
+            rss = current_rss_bytes()
+            with self._lock:
+                for monitor in self._monitors:
+                    monitor.observe(rss)
+
+
+SHARED_SAMPLER = RssSampler()
+
+
+class PeakMemoryMonitor:
+    """Context manager recording the process RSS high-water mark while it is open
+
+    RSS is process-wide: when other requests run at the same time their
+    allocations are included. max_concurrent reports how many monitors
+    (including this one) overlapped, so 1 means the numbers belong to
+    this block alone.
+
+    Usage:
+        with PeakMemoryMonitor() as mem:
+            work()
+        print(mem.peak_mb, mem.delta_mb, mem.max_concurrent)
+    """
+
+    def __init__(self, sampler=SHARED_SAMPLER):
+        self.sampler = sampler
+        self.start_bytes = 0
+        self.peak_bytes = 0
+        self.max_concurrent = 0
+
+    def __enter__(self):
+        self.start_bytes = self.peak_bytes = current_rss_bytes()
+        self.max_concurrent = 0
+        self.sampler.register(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.sampler.unregister(self)
+        self.observe(current_rss_bytes())
+        return False
+
+    def observe(self, rss):
+        if rss > self.peak_bytes:
+            self.peak_bytes = rss
+
+    @property
+    def peak_mb(self):
+        return self.peak_bytes / (1024 * 1024)
+
+    @property
+    def delta_mb(self):
+        """Growth of the process peak over the RSS at entry"""
+        return max(self.peak_bytes - self.start_bytes, 0) / (1024 * 1024)
@@ -0,0 +1,228 @@
+"""In-process Metrics Registry with Prometheus text export
+
+Counters, gauges and histograms keyed by label values. Updates take one
+lock and a dict lookup, so they are cheap enough for per-request hot paths.
+
+Expose on a local endpoint:
+    from metrics import start_http_server
+    start_http_server(9464)   # GET http://127.0.0.1:9464/metrics
+"""
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RATIO_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+
+def _label_text(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {sorted(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            return [(key, value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self.samples()):
+            lines.append(f"{self.name}{_label_text(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            return [(key, (list(s[0]), s[1], s[2])) for key, s in self._values.items()]
+
+    def quantile(self, q, **labels):
+        """Approximate quantile (upper bucket bound), None without observations"""
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            counts = list(state[0]) if state else None
+        if not counts or not sum(counts):
+            return None
+        target, running = q * sum(counts), 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            running += count
+            if running >= target:
+                return bound
+        return float('inf')
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, (counts, total, count) in sorted(self.samples()):
+            running = 0
+            for bound, c in zip(self.buckets + (float('inf'),), counts):
+                running += c
+                le = ('le', _number(bound) if bound == float('inf') else repr(float(bound)))
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {running}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics - counter()/gauge()/histogram() return the existing metric if registered"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._metrics)
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for name in sorted(self.metrics()):
+            lines.extend(self._metrics[name].render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# Detector
+DETECTOR_STAGE_SECONDS = REGISTRY.histogram(
+    'visaflow_detector_stage_seconds', 'Detector stage latency in seconds', ('stage',))
+DETECTOR_DOCUMENTS = REGISTRY.counter(
+    'visaflow_detector_documents_total', 'Documents processed by outcome and type',
+    ('file_type', 'document_type', 'outcome'))
+OCR_PASSES = REGISTRY.counter(
+    'visaflow_ocr_passes_total', 'OCR passes run, by pass and whether its text was accepted',
+    ('ocr_pass', 'accepted'))
+OCR_FALLBACKS = REGISTRY.counter(
+    'visaflow_ocr_fallbacks_total', 'Documents that needed more than one OCR pass on any page')
+OCR_CONFIDENCE = REGISTRY.histogram(
+    'visaflow_ocr_confidence', 'Mean OCR confidence per document', buckets=RATIO_BUCKETS)
+DUPLICATE_LOOKUPS = REGISTRY.counter(
+    'visaflow_duplicate_lookups_total', 'Near-duplicate index lookups', ('result',))
+DETECTOR_PEAK_MEMORY = REGISTRY.gauge(
+    'visaflow_detector_peak_memory_mb', 'Peak RSS during the last detection (MB)')
+
+# Assistant
+LLM_SECONDS = REGISTRY.histogram(
+    'visaflow_llm_request_seconds', 'LLM request latency in seconds', ('operation', 'backend'))
+LLM_REQUESTS = REGISTRY.counter(
+    'visaflow_llm_requests_total', 'LLM requests by outcome', ('operation', 'backend', 'outcome'))
+LLM_TOKENS = REGISTRY.counter(
+    'visaflow_llm_tokens_total', 'LLM tokens by direction', ('operation', 'direction'))
+LLM_COALESCED = REGISTRY.counter(
+    'visaflow_llm_coalesced_total', 'LLM calls served by an identical in-flight request', ('operation',))
+
+
+def make_handler(registry):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+def start_http_server(port=9464, host='127.0.0.1', registry=REGISTRY):
+    """Serve /metrics from a daemon thread; returns the server"""
+    server = ThreadingHTTPServer((host, port), make_handler(registry))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    print(f"[INFO] Metrics endpoint: http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,165 @@
+"""Fast Orientation and Skew Estimation before OCR"""
+import cv2
+import numpy as np
+
+ROTATE_CODES = {
+    90: cv2.ROTATE_90_CLOCKWISE,
+    180: cv2.ROTATE_180,
+    270: cv2.ROTATE_90_COUNTERCLOCKWISE,
+}
+
+
+class OrientationEstimator:
+    """Estimate the rotation (0/90/180/270) and small skew that make text lines horizontal
+
+    Works on a downscaled, binarized copy. Horizontal text gives a row
+    projection profile that alternates between lines and gaps, so the
+    profile's spread is compared for the image and its 90-degree rotation
+    over a range of skew angles. Upright versus upside down comes from the
+    same profile: within each text line, ascenders (and Devanagari's
+    headline) put more ink above the line's core than descenders put
+    below it. Only when that is inconclusive (all-caps text, few lines)
+    are a few detected text boxes recognized both ways with the OCR reader.
+    """
+
+    def __init__(self, work_size=800, max_skew=15.0, min_skew=0.5, probe_boxes=4, flip_margin=0.1,
+                 asymmetry_margin=0.2, min_lines=3):
+        self.work_size = work_size
+        self.max_skew = max_skew
+        self.min_skew = min_skew
+        self.probe_boxes = probe_boxes
+        self.flip_margin = flip_margin
+        self.asymmetry_margin = asymmetry_margin
+        self.min_lines = min_lines
+        self.ocr_checks = 0  # 180-degree checks that needed the reader
+
+    def estimate(self, img, reader=None):
+        """Return (rotation, skew) to pass to correct(); the reader enables the 180-degree check"""
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        scale = min(1.0, self.work_size / float(max(gray.shape[:2])))
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+        binary = cv2.adaptiveThreshold(small, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 25, 15)
+
+        # Coarse search on both orientations, then refine the best skew
+        best = (-1.0, 0, 0.0)
+        for rotation in (0, 90):
+            candidate = cv2.rotate(binary, ROTATE_CODES[90]) if rotation else binary
+            for angle in np.arange(-self.max_skew, self.max_skew + 1e-6, 3.0):
+                score = self._profile_score(candidate, angle)
+                if score > best[0]:
+                    best = (score, rotation, float(angle))
+        _, rotation, skew = best
+        candidate = cv2.rotate(binary, ROTATE_CODES[90]) if rotation else binary
+        for angle in np.arange(skew - 2.5, skew + 2.51, 0.5):
+            score = self._profile_score(candidate, angle)
+            if score > best[0]:
+                best = (score, rotation, float(angle))
+        _, rotation, skew = best
+        if abs(skew) < self.min_skew:
+            skew = 0.0
+
+        # Cheap 180-degree decision first; OCR only settles ambiguous layouts
+        asymmetry = self._line_asymmetry(self.correct(binary, rotation, skew) > 127)
+        if asymmetry is not None and abs(asymmetry) >= self.asymmetry_margin:
+            upside_down = asymmetry < 0
+        elif reader is not None:
+            self.ocr_checks += 1
+            upside_down = self._upside_down(reader, self.correct(small, rotation, skew))
+        else:
+            upside_down = False
+        if upside_down:
+            rotation = (rotation + 180) % 360
+        return rotation, skew
+
+    def correct(self, img, rotation, skew):
+        """Rotate by a multiple of 90 degrees, then deskew (canvas grows to keep the corners)"""
+        if rotation:
+            img = cv2.rotate(img, ROTATE_CODES[rotation])
+        if skew:
+            h, w = img.shape[:2]
+            matrix, size = self._skew_matrix(w, h, skew)
+            img = cv2.warpAffine(img, matrix, size, flags=cv2.INTER_LINEAR,
+                                 borderMode=cv2.BORDER_REPLICATE)
+        return img
+
+    def unmap(self, points, shape, rotation, skew):
+        """Map (x, y) points of a corrected image back onto the uncorrected image of the given shape"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        h, w = shape[:2]
+        if skew:
+            rotated_w, rotated_h = (h, w) if rotation in (90, 270) else (w, h)
+            inverse = cv2.invertAffineTransform(self._skew_matrix(rotated_w, rotated_h, skew)[0])
+            points = points @ inverse[:, :2].T + inverse[:, 2]
+        x, y = points[:, 0], points[:, 1]
+        if rotation == 90:
+            points = np.stack([y, h - 1 - x], axis=1)
+        elif rotation == 180:
+            points = np.stack([w - 1 - x, h - 1 - y], axis=1)
+        elif rotation == 270:
+            points = np.stack([w - 1 - y, x], axis=1)
+        return points
+
+    def _skew_matrix(self, w, h, skew):
+        """Affine deskew matrix and the enlarged canvas size that keeps the corners"""
+        matrix = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), skew, 1.0)
+        cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+        new_w, new_h = int(h * sin + w * cos), int(h * cos + w * sin)
+        matrix[0, 2] += new_w / 2.0 - w / 2.0
+        matrix[1, 2] += new_h / 2.0 - h / 2.0
+        return matrix, (new_w, new_h)
+
+    def _profile_score(self, binary, angle):
+        """Squared coefficient of variation of the row profile - high when rows alternate text/gap"""
+        if angle:
+            h, w = binary.shape
+            matrix = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), angle, 1.0)
+            binary = cv2.warpAffine(binary, matrix, (w, h), flags=cv2.INTER_NEAREST)
+        profile = binary.sum(axis=1, dtype=np.float64)
+        mean = profile.mean()
+        return float(profile.var() / (mean * mean)) if mean > 0 else 0.0
+
+    def _line_asymmetry(self, ink):
+        """(above - below) / total ink outside the text lines' cores, None with too few lines
+        
+        Positive for upright text. Lines are runs of rows with ink; a line's
+        core is the rows holding at least half of its densest row. Runs much
+        taller than the median line (photos, logos) are ignored.
+        """
+        profile = ink.sum(axis=1, dtype=np.float64)
+        if not profile.any():
+            return None
+        rows = np.flatnonzero(profile > 0.05 * profile.max())
+        lines = [line for line in np.split(rows, np.flatnonzero(np.diff(rows) > 1) + 1) if len(line) >= 4]
+        if len(lines) < self.min_lines:
+            return None
+        max_height = 2 * np.median([len(line) for line in lines])
+        above = below = 0.0
+        counted = 0
+        for line in lines:
+            if len(line) > max_height:
+                continue
+            band = profile[line[0]:line[-1] + 1]
+            core = np.flatnonzero(band >= 0.5 * band.max())
+            above += band[:core[0]].sum()
+            below += band[core[-1] + 1:].sum()
+            counted += 1
+        if counted < self.min_lines or above + below == 0:
+            return None
+        return float((above - below) / (above + below))
+
+    def _upside_down(self, reader, gray):
+        """True when the largest text boxes read more confidently rotated by 180 degrees"""
+        horizontal, _ = reader.detect(gray)
+        boxes = sorted(horizontal[0] if horizontal else [],
+                       key=lambda b: -(b[1] - b[0]) * (b[3] - b[2]))[:self.probe_boxes]
+        if not boxes:
+            return False
+
+        h, w = gray.shape[:2]
+        flipped_boxes = [[w - x2, w - x1, h - y2, h - y1] for x1, x2, y1, y2 in boxes]
+        upright = reader.recognize(gray, boxes, [], detail=1)
+        flipped = reader.recognize(cv2.rotate(gray, cv2.ROTATE_180), flipped_boxes, [], detail=1)
+
+        def mean_conf(results):
+            return float(np.mean([r[2] for r in results])) if results else 0.0
+        return mean_conf(flipped) > mean_conf(upright) + self.flip_margin
@@ -0,0 +1,141 @@
+"""Adaptive OCR Pass Ordering learned from production statistics"""
+import json
+import os
+import random
+import threading
+from pathlib import Path
+
+import cv2
+
+try:
+    import fcntl
+except ImportError:  # Windows - saves are still atomic, just not serialized across processes
+    fcntl = None
+
+
+def image_features(img, source_format):
+    """Cheap input features used to bucket documents (computed on a downscaled copy)"""
+    h, w = img.shape[:2]
+    scale = min(1.0, 512.0 / max(h, w))
+    small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else img
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+    return {
+        'format': source_format.lower().lstrip('.') or 'unknown',
+        'megapixels': h * w / 1e6,
+        'sharpness': float(cv2.Laplacian(gray, cv2.CV_64F).var()),
+        'contrast': float(gray.std()),
+        # Clean digital scans are mostly pure background
+        'background': float((gray > 235).mean()),
+    }
+
+
+def feature_bucket(features):
+    """Coarse bucket key - e.g. 'png|1-4mp|sharp|normal|clean'"""
+    mp = features['megapixels']
+    size = '<1mp' if mp < 1 else '1-4mp' if mp < 4 else '4-12mp' if mp < 12 else '12+mp'
+    sharp = 'sharp' if features['sharpness'] >= 100 else 'blurry'
+    contrast = 'low' if features['contrast'] < 40 else 'normal'
+    clean = 'clean' if features['background'] > 0.6 else 'photo'
+    return '|'.join((features['format'], size, sharp, contrast, clean))
+
+
+class PassPolicy:
+    """Per-bucket success statistics for each OCR pass, persisted as JSON
+
+    order() ranks passes by smoothed success rate (successes / attempts)
+    and drops passes that have almost never succeeded in that bucket.
+    A small exploration rate keeps using the default order so statistics
+    for demoted passes stay current.
+
+    Several policies (detectors, benchmarks, processes) may share one
+    file. Each keeps the counts recorded since its last save apart and
+    save() merges them into the file's current contents under a file
+    lock, so no writer erases another's statistics.
+    """
+
+    def __init__(self, path='outputs/pass_policy.json', min_samples=20, skip_rate=0.02,
+                 explore=0.05, save_every=10):
+        self.path = Path(path) if path else None
+        self.min_samples = min_samples
+        self.skip_rate = skip_rate
+        self.explore = explore
+        self.save_every = save_every
+        self.stats = {}
+        self._pending = {}  # counts recorded since the last save
+        self._dirty = 0
+        self._lock = threading.Lock()
+        if self.path and self.path.exists():
+            try:
+                self.stats = json.loads(self.path.read_text())
+            except (OSError, ValueError) as e:
+                print(f"[WARNING] Could not load pass policy: {e}")
+
+    def order(self, bucket, default_order):
+        """Pass order for a bucket; the default order until enough samples exist"""
+        with self._lock:
+            stats = self.stats.get(bucket, {})
+        if random.random() < self.explore:
+            return list(default_order)
+
+        ranked = []
+        for rank, name in enumerate(default_order):
+            s = stats.get(name, {'tried': 0, 'won': 0})
+            if s['tried'] >= self.min_samples and s['won'] / s['tried'] < self.skip_rate:
+                continue
+            # Laplace-smoothed success rate; ties keep the default order
+            rate = (s['won'] + 1.0) / (s['tried'] + 2.0) if s['tried'] >= self.min_samples else None
+            ranked.append((rate, rank, name))
+
+        if not ranked:
+            return list(default_order)
+        if all(rate is None for rate, _, _ in ranked):
+            return [name for _, _, name in ranked]
+        ranked.sort(key=lambda r: (-(r[0] if r[0] is not None else 0.5), r[1]))
+        return [name for _, _, name in ranked]
+
+    def record(self, bucket, tried, accepted):
+        """Record which passes ran and which one (if any) produced the accepted result"""
+        with self._lock:
+            for counts in (self.stats, self._pending):
+                stats = counts.setdefault(bucket, {})
+                for name in tried:
+                    s = stats.setdefault(name, {'tried': 0, 'won': 0})
+                    s['tried'] += 1
+                    if name == accepted:
+                        s['won'] += 1
+            self._dirty += 1
+            if self._dirty >= self.save_every:
+                self._save()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        """Merge pending counts into the file (re-read under a file lock) and replace it atomically"""
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix('.lock'), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            merged = {}
+            if self.path.exists():
+                try:
+                    merged = json.loads(self.path.read_text())
+                except (OSError, ValueError) as e:
+                    print(f"[WARNING] Could not re-read pass policy, keeping in-memory counts: {e}")
+                    merged = self.stats
+                    self._pending = {}
+            for bucket, passes in self._pending.items():
+                stats = merged.setdefault(bucket, {})
+                for name, delta in passes.items():
+                    s = stats.setdefault(name, {'tried': 0, 'won': 0})
+                    s['tried'] += delta['tried']
+                    s['won'] += delta['won']
+            tmp = self.path.with_suffix(f'.{os.getpid()}.tmp')
+            tmp.write_text(json.dumps(merged, indent=1, sort_keys=True))
+            os.replace(tmp, self.path)
+        self.stats = merged
+        self._pending = {}
+        self._dirty = 0
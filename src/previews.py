@@ -0,0 +1,203 @@
+"""Server-side Thumbnails and Previews for uploaded documents"""
+import io
+import os
+import threading
+import zipfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageOps, features
+
+from document_locator import DocumentLocator
+from orientation import OrientationEstimator
+from stage_cache import file_digest
+from temp_storage import temp_dir
+
+EXIF_ORIENTATION = 0x0112
+REGION_COLOR = (34, 197, 94)
+TEXT_COLOR = (249, 115, 22)
+
+
+def fit(img, max_side=800):
+    """Downscale a BGR/grayscale array so its longer side is at most max_side"""
+    scale = max_side / float(max(img.shape[:2]))
+    if scale >= 1.0:
+        return img
+    return cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def text_box_polygons(result, source_shape, orientation=None):
+    """Text boxes of a detection result as (n, 4, 2) polygons in original image coordinates
+
+    OCR boxes live in the frame the accepted pass read: the corrected crop
+    (perspective-warped or YOLO-cropped) or the corrected full image. The
+    orientation correction is undone first, then the crop is mapped back.
+    Results from a downscaling profile are scaled back up by input_scale.
+    Returns an empty array when the geometry is not this image's: duplicate
+    hits reuse another photo's OCR, and multi-page info mixes pages.
+    """
+    empty = np.zeros((0, 4, 2), dtype=np.float32)
+    accepted = result.get('accepted_pass')
+    if not accepted or result.get('duplicate_distance') is not None or result.get('pages', 1) > 1:
+        return empty
+    boxes = [block['box'] for block in result.get('text_blocks', ())]
+    if not boxes:
+        return empty
+
+    x1, y1, x2, y2 = np.asarray(boxes, dtype=np.float64).T
+    points = np.stack([x1, y1, x2, y1, x2, y2, x1, y2], axis=1).reshape(-1, 2)
+
+    input_scale = result.get('input_scale', 1.0)
+    h, w = int(round(source_shape[0] * input_scale)), int(round(source_shape[1] * input_scale))
+    method, region_box = result.get('region_method'), result.get('region_box')
+    matrix = offset = None
+    frame = (h, w)
+    if accepted == 'crop' and region_box and method == 'classical':
+        matrix, (crop_w, crop_h) = DocumentLocator().warp_params(np.asarray(region_box, dtype=np.float32))
+        frame = (crop_h, crop_w)
+    elif accepted == 'crop' and region_box and method == 'yolo':
+        (left, top), (right, bottom) = region_box[0], region_box[2]
+        offset = np.array([left, top], dtype=np.float64)
+        frame = (bottom - top + 1, right - left + 1)
+
+    rotation, skew = result.get('rotation', 0), result.get('skew', 0.0)
+    if rotation or skew:
+        points = (orientation or OrientationEstimator()).unmap(points, frame, rotation, skew)
+    if matrix is not None:
+        points = cv2.perspectiveTransform(points.reshape(-1, 1, 2).astype(np.float32),
+                                          np.linalg.inv(matrix)).reshape(-1, 2)
+    elif offset is not None:
+        points = points + offset
+    return (np.asarray(points, dtype=np.float32) / input_scale).reshape(-1, 4, 2)
+
+
+class PreviewStore:
+    """Display-resolution previews, rendered once per upload and cached on disk by content hash
+
+    Images are decoded at reduced scale where the codec allows it (JPEG
+    draft mode) and EXIF-rotated like OpenCV does. PDFs rasterize only
+    the first page, directly at preview size. DOCX files show their
+    largest embedded picture - usually the scanned document - or a
+    rendering of the first paragraphs. Files are written as WebP (JPEG
+    when Pillow lacks WebP support) to a private temp directory (see
+    temp_storage.py), since they show personal documents.
+    """
+
+    def __init__(self, directory=None, max_side=800, quality=80):
+        self.directory = Path(directory) if directory else temp_dir('previews')
+        self.max_side = max_side
+        self.quality = quality
+        self.format, self.extension = ('WEBP', '.webp') if features.check('webp') else ('JPEG', '.jpg')
+        self.orientation = OrientationEstimator()
+
+    def path(self, digest, variant='thumb'):
+        return self.directory / f"{digest}_{variant}_{self.max_side}{self.extension}"
+
+    def thumbnail(self, file_path, digest=None):
+        """Path of the cached preview for file_path, rendering it on first use"""
+        digest = digest or file_digest(file_path)[:16]
+        path = self.path(digest)
+        if not path.exists():
+            self._save(self._render(Path(file_path)), path)
+        return path
+
+    def overlay(self, file_path, result, key, digest=None):
+        """Preview with the detected region and text boxes drawn on top; None for non-images
+
+        key identifies the scan settings (languages, region method) that
+        produced result, so each configuration gets its own cached overlay.
+        """
+        file_path = Path(file_path)
+        if file_path.suffix.lower() in ('.pdf', '.docx') or not result or 'error' in result:
+            return None
+        digest = digest or file_digest(file_path)[:16]
+        path = self.path(digest, f"overlay-{key}")
+        if path.exists():
+            return path
+
+        with Image.open(self.thumbnail(file_path, digest)) as image:
+            preview = image.convert('RGB')
+        width, height = self._source_size(file_path)
+        scale = preview.width / float(width)
+        draw = ImageDraw.Draw(preview)
+        line = max(2, self.max_side // 300)
+
+        if result.get('region_method') in ('classical', 'yolo') and result.get('region_box') \
+                and result.get('duplicate_distance') is None and result.get('pages', 1) == 1:
+            region_scale = scale / result.get('input_scale', 1.0)
+            region = [(x * region_scale, y * region_scale) for x, y in result['region_box']]
+            draw.line(region + region[:1], fill=REGION_COLOR, width=line + 1)
+        for polygon in text_box_polygons(result, (height, width), self.orientation):
+            points = [(float(x) * scale, float(y) * scale) for x, y in polygon]
+            draw.line(points + points[:1], fill=TEXT_COLOR, width=line)
+
+        self._save(preview, path)
+        return path
+
+    def _render(self, file_path):
+        suffix = file_path.suffix.lower()
+        if suffix == '.pdf':
+            return self._render_pdf(file_path)
+        if suffix == '.docx':
+            return self._render_docx(file_path)
+        with Image.open(file_path) as image:
+            return self._render_image(image)
+
+    def _render_image(self, image):
+        """Loaded RGB thumbnail - independent of the source image, which callers close"""
+        # JPEG decodes at 1/2, 1/4 or 1/8 scale in draft mode - no full-size decode
+        image.draft('RGB', (self.max_side, self.max_side))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+        return image
+
+    def _render_pdf(self, file_path):
+        import fitz
+        with fitz.open(str(file_path)) as doc:
+            page = doc[0]
+            zoom = self.max_side / max(page.rect.width, page.rect.height)
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+    def _render_docx(self, file_path):
+        with zipfile.ZipFile(file_path) as archive:
+            media = [info for info in archive.infolist() if info.filename.startswith('word/media/')]
+            for info in sorted(media, key=lambda i: -i.file_size):
+                try:
+                    with Image.open(io.BytesIO(archive.read(info))) as image:
+                        return self._render_image(image)
+                except Exception:
+                    continue  # EMF/WMF and other formats Pillow cannot open
+
+        import docx
+        paragraphs = [p.text for p in docx.Document(str(file_path)).paragraphs if p.text.strip()]
+        width, height = int(self.max_side / 1.414), self.max_side
+        page = Image.new('RGB', (width, height), 'white')
+        draw = ImageDraw.Draw(page)
+        y = 24
+        for text in paragraphs:
+            for start in range(0, len(text), 60):
+                if y > height - 24:
+                    return page
+                draw.text((24, y), text[start:start + 60], fill='black')
+                y += 14
+            y += 6
+        return page
+
+    def _source_size(self, file_path):
+        """(width, height) of the first frame as OpenCV sees it (EXIF orientation applied)"""
+        with Image.open(file_path) as image:
+            width, height = image.size
+            if image.getexif().get(EXIF_ORIENTATION, 1) in (5, 6, 7, 8):
+                width, height = height, width
+        return width, height
+
+    def _save(self, image, path):
+        """Write atomically - concurrent sessions may render the same upload"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.stem}.{os.getpid()}-{threading.get_ident()}.tmp")
+        image.save(tmp, format=self.format, quality=self.quality)
+        os.replace(tmp, path)
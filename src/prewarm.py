@@ -0,0 +1,55 @@
+"""Pre-warm the visa requirements store for popular corridors
+
+Usage:
+    python src/prewarm.py --corridors corridors.csv      # from_country,to_country,purpose per line
+    python src/prewarm.py --from-log --top 50            # most looked-up corridors
+"""
+import argparse
+import csv
+import time
+from concurrent.futures import wait
+
+from visa_store import BackgroundRefresher, VisaRequirementsStore
+
+
+def read_corridors(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return [tuple(cell.strip() for cell in row[:3]) for row in csv.reader(f)
+                if len(row) >= 3 and not row[0].startswith('#')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill the visa requirements store in the background")
+    parser.add_argument('--corridors', help="CSV of from_country,to_country,purpose")
+    parser.add_argument('--from-log', action='store_true', help="Use the most looked-up corridors")
+    parser.add_argument('--top', type=int, default=50)
+    parser.add_argument('--since-days', type=int, default=30)
+    parser.add_argument('--db', default='outputs/visa_requirements.db')
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent LLM requests")
+    parser.add_argument('--max-age-hours', type=float, default=24 * 7)
+    parser.add_argument('--force', action='store_true', help="Refresh even fresh entries")
+    args = parser.parse_args()
+
+    store = VisaRequirementsStore(args.db, max_age_hours=args.max_age_hours)
+    corridors = []
+    if args.corridors:
+        corridors.extend(read_corridors(args.corridors))
+    if args.from_log:
+        corridors.extend(store.popular_corridors(args.top, args.since_days))
+    if not corridors:
+        parser.error("no corridors - pass --corridors and/or --from-log")
+
+    from llm_assistant import VisaAssistant
+    refresher = BackgroundRefresher(store, VisaAssistant, max_workers=args.workers)
+
+    start = time.perf_counter()
+    futures = refresher.prewarm(dict.fromkeys(corridors), force=args.force)
+    print(f"[INFO] {len(futures)}/{len(corridors)} corridors need refreshing")
+    done, _ = wait(futures)
+    ok = sum(1 for f in done if f.result())
+    print(f"[SUCCESS] Refreshed {ok}/{len(futures)} corridors in {time.perf_counter() - start:.1f}s")
+    refresher.executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Opt-in Per-request Profiling with speedscope / pstats artifacts
+
+Off by default. Enable with VISAFLOW_PROFILE=sample (stack sampling, low
+overhead, speedscope flamegraph) or VISAFLOW_PROFILE=cprofile (exact call
+counts, .prof file for snakeviz/pstats), or call set_mode() at runtime.
+A single request can override the process mode with
+profile_request(..., mode=...). When off, profile_request() returns a
+no-op context manager.
+
+Only one request is cProfiled at a time (the interpreter allows a single
+active profiler); a request asking for cProfile while another holds it is
+stack-sampled instead. Pool work submitted through bind() is attributed
+to the request that submitted it, so concurrent requests' samples never
+mix.
+
+Artifacts are written to outputs/profiles/<request_id>.speedscope.json or
+.prof; open speedscope files at https://www.speedscope.app.
+"""
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import nullcontext
+from pathlib import Path
+
+MODES = ('sample', 'cprofile')
+OUTPUT_DIR = Path('outputs/profiles')
+DEFAULT = 'default'  # profile_request(mode=DEFAULT) follows the process-wide mode
+
+_CPROFILE_LOCK = threading.Lock()
+_owners = {}  # worker thread ident -> ident of the request thread it is working for
+
+_mode = os.getenv('VISAFLOW_PROFILE', '').strip().lower() or None
+if _mode is not None and _mode not in MODES:
+    print(f"[WARNING] Ignoring VISAFLOW_PROFILE={_mode} (expected one of {MODES})")
+    _mode = None
+
+
+def set_mode(mode):
+    """Enable ('sample' or 'cprofile') or disable (None) profiling process-wide"""
+    global _mode
+    if mode is not None and mode not in MODES:
+        raise ValueError(f"Unknown profiling mode: {mode}")
+    _mode = mode
+
+
+def get_mode():
+    return _mode
+
+
+def profile_request(label, top_n=15, mode=DEFAULT):
+    """Context manager yielding a RequestProfile, or None when profiling is off
+    
+    mode is 'sample', 'cprofile', None (off) or DEFAULT for the process mode.
+    """
+    if mode == DEFAULT:
+        mode = _mode
+    if mode is None:
+        return nullcontext(None)
+    if mode not in MODES:
+        raise ValueError(f"Unknown profiling mode: {mode}")
+    return RequestProfile(label, mode, top_n)
+
+
+def bind(fn):
+    """Wrap fn so the pool thread running it is sampled as part of the calling request"""
+    caller = threading.get_ident()
+    owner = _owners.get(caller, caller)
+    
+    def run(*args, **kwargs):
+        ident = threading.get_ident()
+        previous = _owners.get(ident)
+        _owners[ident] = owner
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if previous is None:
+                _owners.pop(ident, None)
+            else:
+                _owners[ident] = previous
+    return run
+
+
+class RequestProfile:
+    """Profile one request; after the with-block, .top and .path describe the result"""
+
+    def __init__(self, label, mode='sample', top_n=15, output_dir=OUTPUT_DIR, interval=0.002):
+        self.label = label
+        self.mode = mode
+        self.top_n = top_n
+        self.output_dir = Path(output_dir)
+        self.interval = interval
+        self.request_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{uuid.uuid4().hex[:8]}"
+        self.path = None
+        self.top = []
+        self.elapsed = 0.0
+        self._sampler = None
+        self._profile = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        if self.mode == 'cprofile' and not _CPROFILE_LOCK.acquire(blocking=False):
+            print(f"[WARNING] Another request is being cProfiled, sampling {self.request_id} instead")
+            self.mode = 'sample'
+        if self.mode == 'cprofile':
+            self._profile = cProfile.Profile()
+            try:
+                self._profile.enable()
+            except Exception:
+                _CPROFILE_LOCK.release()
+                raise
+        else:
+            self._sampler = StackSampler(threading.get_ident(), self.interval)
+            self._sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._profile is not None:
+            self._profile.disable()
+            _CPROFILE_LOCK.release()
+        else:
+            self._sampler.stop()
+        self.elapsed = time.perf_counter() - self._start
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            if self._profile is not None:
+                self._finish_cprofile()
+            else:
+                self._finish_samples()
+            print(f"[INFO] Profile {self.request_id}: {self.elapsed:.2f}s -> {self.path}")
+        except Exception as e:
+            print(f"[WARNING] Could not write profile {self.request_id}: {e}")
+        return False
+
+    def _finish_cprofile(self):
+        self.path = self.output_dir / f"{self.request_id}.prof"
+        self._profile.dump_stats(str(self.path))
+        rows = []
+        for (filename, line, name), (_, calls, self_s, total_s, _) in pstats.Stats(self._profile).stats.items():
+            rows.append({'function': name, 'location': f"{Path(filename).name}:{line}",
+                         'calls': calls, 'self_s': self_s, 'total_s': total_s})
+        rows.sort(key=lambda r: -r['self_s'])
+        self.top = rows[:self.top_n]
+
+    def _finish_samples(self):
+        sampler = self._sampler
+        seconds = self.elapsed / max(sampler.ticks, 1)
+        self.path = self.output_dir / f"{self.request_id}.speedscope.json"
+        self.path.write_text(json.dumps(sampler.to_speedscope(self.request_id, seconds)))
+
+        self_counts, total_counts = Counter(), Counter()
+        for stack, count in sampler.samples.items():
+            self_counts[stack[-1]] += count
+            for frame in set(stack[1:]):
+                total_counts[frame] += count
+        self.top = [{'function': name, 'location': f"{Path(filename).name}:{line}", 'calls': None,
+                     'self_s': count * seconds, 'total_s': total_counts[(name, filename, line)] * seconds}
+                    for (name, filename, line), count in self_counts.most_common(self.top_n)]
+
+    def summary(self):
+        return {'request_id': self.request_id, 'mode': self.mode, 'elapsed_s': self.elapsed,
+                'path': str(self.path) if self.path else None, 'top': self.top}
+
+
+class StackSampler:
+    """Background thread recording Python stacks of the request thread and its pool work
+    
+    Pool threads are sampled only while running a task submitted through
+    bind() by this request, so other requests' OCR is never attributed to it.
+    """
+
+    def __init__(self, target_ident, interval=0.002):
+        self.target_ident = target_ident
+        self.interval = interval
+        self.samples = Counter()  # (thread root, frame, ..., leaf frame) -> count
+        self.ticks = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        names = {}
+        while not self._stop.wait(self.interval):
+            self.ticks += 1
+            frames = sys._current_frames()
+            if any(ident not in names for ident in frames):
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident != self.target_ident and _owners.get(ident) != self.target_ident:
+                    continue
+                name = names.get(ident, '')
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                stack.append((f"thread {name or ident}", '', 0))
+                self.samples[tuple(reversed(stack))] += 1
+
+    def to_speedscope(self, name, seconds_per_sample):
+        """speedscope 'sampled' profile (https://www.speedscope.app/file-format-schema.json)"""
+        frame_index = {}
+        stacks, weights = [], []
+        for stack, count in self.samples.items():
+            stacks.append([frame_index.setdefault(frame, len(frame_index)) for frame in stack])
+            weights.append(count * seconds_per_sample)
+        frames = [{'name': fname, 'file': filename, 'line': line}
+                  for (fname, filename, line), _ in sorted(frame_index.items(), key=lambda f: f[1])]
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'visaflow-profiler',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled', 'name': name, 'unit': 'seconds',
+                'startValue': 0, 'endValue': sum(weights),
+                'samples': stacks, 'weights': weights
+            }]
+        }
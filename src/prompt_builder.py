@@ -0,0 +1,99 @@
+"""Compact, Token-budgeted Prompt Builder for Document Analysis"""
+import re
+import numpy as np
+from text_blocks import TextBlocks
+
+
+def normalize_text(text):
+    """Casefold and drop punctuation and whitespace, so '1234 5678' and '1234-5678' compare equal"""
+    return re.sub(r'[\W_]+', '', text.casefold())
+
+
+class DocumentPromptBuilder:
+    """Pack structured fields plus the best OCR text into a token budget
+
+    count_tokens(text) -> int is the model's token counter. It is called
+    once per prompt, on the header plus candidate text; every other cost
+    (header, blocks, final section) is estimated from the resulting
+    tokens-per-character ratio. When the fixed overhead alone exceeds the
+    budget, only the header is sent and stats report the overflow.
+    """
+
+    def __init__(self, count_tokens, token_budget=1000, min_confidence=0.5, min_blocks=5):
+        self.count_tokens = count_tokens
+        self.token_budget = token_budget
+        self.min_confidence = min_confidence
+        self.min_blocks = min_blocks
+
+    def build(self, detection_result, fields, overhead_tokens=0, token_budget=None):
+        """Return (document_section, stats) fitting token_budget - overhead_tokens"""
+        budget = (token_budget or self.token_budget) - overhead_tokens
+        doc_type = detection_result.get('document_type', 'document')
+        type_conf = detection_result.get('type_confidence')
+
+        header = [f"Document type: {doc_type}" + (f" (confidence {type_conf:.0%})" if type_conf is not None else "")]
+        if fields:
+            header.append("Extracted fields:")
+            header.extend(f"- {key.replace('_', ' ')}: {value}" for key, value in fields.items())
+        header = "\n".join(header)
+
+        candidates, stats = self._select_blocks(detection_result.get('text_blocks', TextBlocks()), fields)
+
+        # One token count calibrates a tokens/char ratio for everything else
+        sample = "\n".join([header] + [text for _, text, _ in candidates])
+        ratio = self.count_tokens(sample) / float(max(len(sample), 1))
+        remaining = budget - int(len(header) * ratio) - 1 - 8  # "Other text:" label + separators
+        chosen = []
+        if budget <= 0:
+            print(f"[WARNING] Prompt overhead ({overhead_tokens} tokens) exceeds the budget - sending the header only")
+        elif candidates and remaining > 0:
+            # Highest confidence first, then restore document order
+            for index, text, _ in sorted(candidates, key=lambda c: -c[2]):
+                cost = int(len(text) * ratio) + 1
+                if cost <= remaining:
+                    chosen.append((index, text))
+                    remaining -= cost
+            chosen.sort()
+
+        section = header
+        if chosen:
+            section += "\n\nOther text (high-confidence OCR, document order):\n"
+            section += "\n".join(text for _, text in chosen)
+
+        total = budget + overhead_tokens
+        used = int(len(section) * ratio) + 1 + overhead_tokens
+        stats.update({
+            'token_budget': total,
+            'prompt_tokens': used,
+            'budget_used': min(used / float(total), 1.0) if total > 0 else 1.0,
+            'overflow_tokens': max(used - total, 0),
+            'blocks_used': len(chosen),
+            'blocks_over_budget': len(candidates) - len(chosen),
+        })
+        return section, stats
+
+    def _select_blocks(self, text_blocks, fields):
+        """High-confidence, deduplicated (index, text, confidence) rows not already covered by fields"""
+        field_values = {normalize_text(str(v)) for v in (fields or {}).values()}
+        confidence = text_blocks.confidence
+        confident = np.flatnonzero(confidence >= self.min_confidence)
+
+        # Sparse or poor scans: fall back to the best blocks available
+        if len(confident) < self.min_blocks:
+            confident = np.sort(np.argsort(-confidence, kind='stable')[:self.min_blocks])
+
+        texts = text_blocks.texts
+        seen = set()
+        selected = []
+        for index in confident:
+            key = normalize_text(texts[index])
+            if len(key) < 2 or key in seen or key in field_values:
+                continue
+            seen.add(key)
+            selected.append((int(index), texts[index], float(confidence[index])))
+
+        return selected, {
+            'blocks_total': len(text_blocks),
+            'blocks_low_confidence': len(text_blocks) - len(confident),
+            'duplicates_removed': len(confident) - len(selected),
+        }
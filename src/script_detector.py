@@ -0,0 +1,140 @@
+"""Script Identification - route each document to the smallest EasyOCR reader"""
+import threading
+from collections import Counter
+
+import numpy as np
+
+# Unicode blocks used to attribute recognised characters to a script
+SCRIPT_RANGES = {
+    'devanagari': (0x0900, 0x097F),
+    'bengali': (0x0980, 0x09FF),
+    'tamil': (0x0B80, 0x0BFF),
+    'telugu': (0x0C00, 0x0C7F),
+    'kannada': (0x0C80, 0x0CFF),
+}
+
+# Scripts whose letters hang from a continuous headline (shirorekha)
+HEADLINE_SCRIPTS = ('devanagari', 'bengali')
+
+# EasyOCR language code that carries the recogniser for each script
+SCRIPT_LANGUAGES = {
+    'devanagari': 'hi',
+    'bengali': 'bn',
+    'tamil': 'ta',
+    'telugu': 'te',
+    'kannada': 'kn',
+}
+
+
+class ReaderPool:
+    """Lazily-built EasyOCR readers shared across requests, keyed by language set"""
+
+    def __init__(self, gpu=False):
+        self.gpu = gpu
+        self._readers = {}
+        self._lock = threading.Lock()
+
+    def get(self, languages):
+        key = tuple(dict.fromkeys(languages))
+        with self._lock:
+            if key not in self._readers:
+                print(f"[INFO] Loading EasyOCR reader for {list(key)}")
+                import easyocr  # Deferred so SCRIPT_RANGES can be used without the OCR stack
+                self._readers[key] = easyocr.Reader(list(key), gpu=self.gpu)
+            return self._readers[key]
+
+
+class ScriptDetector:
+    """Identify the script of a document from a handful of detected text crops
+
+    When the English reader is not confident, at most max_candidates
+    script recognizers run. Candidates are ranked without recognition: a
+    headline stroke across the crops points to Devanagari/Bengali, its
+    absence to the southern scripts, and ties go to the scripts seen most
+    often so far. The search stops early on a confident share.
+    """
+
+    def __init__(self, pool, scripts=tuple(SCRIPT_LANGUAGES), max_crops=6,
+                 latin_confidence=0.8, min_share=0.2, max_candidates=2, confident_share=0.5,
+                 headline_ratio=2.5):
+        self.pool = pool
+        self.scripts = scripts
+        self.max_crops = max_crops
+        self.latin_confidence = latin_confidence
+        self.min_share = min_share
+        self.max_candidates = max_candidates
+        self.confident_share = confident_share
+        self.headline_ratio = headline_ratio
+        self.seen = Counter()
+
+    def select_languages(self, img):
+        """Return the minimal language list for EasyOCR on this image"""
+        scores = self.detect_scripts(img)
+        if not scores:
+            return ['en']
+
+        script = max(scores, key=scores.get)
+        if scores[script] < self.min_share:
+            return ['en']
+        self.seen[script] += 1
+        return ['en', SCRIPT_LANGUAGES[script]]
+
+    def detect_scripts(self, img):
+        """Score each candidate script by its share of recognised characters"""
+        base = self.pool.get(['en'])
+        horizontal, _ = base.detect(img)
+        boxes = horizontal[0] if horizontal else []
+        if not boxes:
+            return {}
+
+        # Largest boxes are the most legible - a few are enough to tell scripts apart
+        boxes = sorted(boxes, key=lambda b: (b[1] - b[0]) * (b[3] - b[2]), reverse=True)
+        boxes = boxes[:self.max_crops]
+
+        # Cheap exit for Latin-only documents: the English recogniser reads them confidently
+        latin = base.recognize(img, horizontal_list=boxes, free_list=[], detail=1)
+        if latin and min(item[2] for item in latin) >= self.latin_confidence:
+            print("[INFO] Script detection: Latin")
+            return {}
+
+        scores = {}
+        for script in self.rank_candidates(img, boxes)[:self.max_candidates]:
+            reader = self.pool.get(['en', SCRIPT_LANGUAGES[script]])
+            results = reader.recognize(img, horizontal_list=boxes, free_list=[], detail=1)
+            scores[script] = self._script_share(results, script)
+            if scores[script] >= self.confident_share:
+                break
+
+        print(f"[INFO] Script detection scores: {scores}")
+        return scores
+
+    def rank_candidates(self, img, boxes):
+        """Candidate scripts, most likely first, from crop shape and selection history"""
+        headline = self._has_headline(img, boxes)
+        return sorted(self.scripts, key=lambda s: ((s in HEADLINE_SCRIPTS) != headline,
+                                                   -self.seen[s], self.scripts.index(s)))
+
+    def _has_headline(self, img, boxes):
+        """True when most crops have one ink row far denser than the rest (a shirorekha)"""
+        gray = np.asarray(img, dtype=np.float32)
+        if gray.ndim == 3:
+            gray = gray.mean(axis=2)
+        votes = []
+        for x1, x2, y1, y2 in boxes:
+            crop = gray[max(0, int(y1)):int(y2), max(0, int(x1)):int(x2)]
+            if crop.shape[0] < 4 or crop.shape[1] < 4:
+                continue
+            rows = (crop < crop.mean()).mean(axis=1)
+            votes.append(rows.max() > self.headline_ratio * max(rows.mean(), 1e-6))
+        return bool(votes) and sum(votes) * 2 > len(votes)
+
+    def _script_share(self, results, script):
+        """Confidence-weighted fraction of characters that belong to the script"""
+        lo, hi = SCRIPT_RANGES[script]
+        weighted = 0.0
+        for item in results:
+            chars = [c for c in item[1] if not c.isspace()]
+            if chars:
+                native = sum(1 for c in chars if lo <= ord(c) <= hi)
+                weighted += item[2] * native / len(chars)
+        return weighted / len(results) if results else 0.0
@@ -0,0 +1,106 @@
+"""Single-flight Coalescing of identical in-flight calls"""
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Stream:
+    def __init__(self):
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.cond = threading.Condition()
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution
+
+    do(key, fn) runs fn once for all callers that arrive while it is in
+    flight; every caller gets the same result (or exception). stream(key,
+    fn) does the same for generators: one background pump consumes fn()
+    and every caller replays the chunks so far, then follows live, so a
+    caller stopping early never cuts off the others. Keys are released as
+    soon as the call completes - this is coalescing, not caching.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return (result, shared) - shared is True when another caller ran fn"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stream(self, key, fn, on_shared=None):
+        """Yield the chunks of fn() - one underlying stream per key while in flight"""
+        with self._lock:
+            flight = self._streams.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._streams[key] = _Stream()
+
+        if leader:
+            threading.Thread(target=self._pump, args=(key, flight, fn), name='single-flight', daemon=True).start()
+        elif on_shared is not None:
+            on_shared()
+
+        index = 0
+        while True:
+            with flight.cond:
+                while index >= len(flight.chunks) and not flight.finished:
+                    flight.cond.wait()
+                chunks = flight.chunks[index:]
+                finished = flight.finished
+            for chunk in chunks:
+                yield chunk
+            index += len(chunks)
+            if finished and index >= len(flight.chunks):
+                break
+        if flight.error is not None:
+            raise flight.error
+
+    def _pump(self, key, flight, fn):
+        try:
+            for chunk in fn():
+                with flight.cond:
+                    flight.chunks.append(chunk)
+                    flight.cond.notify_all()
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                del self._streams[key]
+            with flight.cond:
+                flight.finished = True
+                flight.cond.notify_all()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls) + len(self._streams)
@@ -0,0 +1,104 @@
+"""Memory-bounded Cache of language-independent pipeline stages"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file's bytes - the input key for every cached stage"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def nbytes(value):
+    """Approximate memory held by a cached value (arrays dominate)"""
+    if isinstance(value, np.ndarray):
+        # Views (YOLO crops) are counted in full - over-counting keeps the bound safe
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return 64 + sum(nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return 64 + sum(nbytes(v) for v in value.values())
+    return 64
+
+
+class StageCache:
+    """LRU of intermediate artifacts keyed by (stage, input hash, parameters...)
+
+    Holds the decoded image, region crop, preprocessed images and text
+    detection boxes - everything upstream of language-dependent
+    recognition. Least recently used entries are evicted once the total
+    exceeds max_bytes. Cached arrays are shared, so callers must treat
+    them as read-only.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (value, size)
+        self.bytes = 0
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            stage = key[0]
+            if entry is None:
+                self.misses[stage] = self.misses.get(stage, 0) + 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits[stage] = self.hits.get(stage, 0) + 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = nbytes(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self.entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+
+    def get_or_compute(self, key, compute):
+        """Cached value for key, computing (outside the lock) and storing it on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            hits, misses = sum(self.hits.values()), sum(self.misses.values())
+            return {
+                'entries': len(self.entries),
+                'mb': self.bytes / 1024.0 / 1024.0,
+                'max_mb': self.max_bytes / 1024.0 / 1024.0,
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / float(hits + misses) if hits + misses else 0.0,
+                'by_stage': {stage: (self.hits.get(stage, 0), self.misses.get(stage, 0))
+                             for stage in sorted(set(self.hits) | set(self.misses))}
+            }
+
+
+# Shared by every detector in the process - the app builds one detector per
+# language selection, and they all reuse each other's upstream stages
+SHARED_STAGE_CACHE = StageCache()
@@ -0,0 +1,54 @@
+"""Short-lived Private Storage for uploaded documents and their previews
+
+Uploads are passports and ID cards, so they live under the system temp
+directory (VISAFLOW_TEMP_DIR overrides it), never under outputs/, and
+purge() keeps each directory bounded by age and total size.
+"""
+import os
+import tempfile
+import time
+from pathlib import Path
+
+TEMP_ROOT = Path(os.environ.get('VISAFLOW_TEMP_DIR') or Path(tempfile.gettempdir()) / 'visaflow')
+
+
+def temp_dir(name):
+    """Private (0700) subdirectory of TEMP_ROOT, created on first use"""
+    path = TEMP_ROOT / name
+    path.mkdir(parents=True, exist_ok=True, mode=0o700)
+    return path
+
+
+def touch(path):
+    """Mark a file as recently used so purge() keeps it"""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def purge(directory, max_age_s=3600, max_bytes=256 * 1024 * 1024):
+    """Delete files unused for max_age_s, then the oldest until the rest fit max_bytes"""
+    files = []
+    for path in Path(directory).iterdir():
+        try:
+            stat = path.stat()
+        except OSError:
+            continue  # Removed by another session
+        if path.is_file():
+            files.append((stat.st_mtime, stat.st_size, path))
+
+    now, removed = time.time(), 0
+    total = sum(size for _, size, _ in files)
+    for mtime, size, path in sorted(files):
+        if now - mtime <= max_age_s and total <= max_bytes:
+            break
+        try:
+            path.unlink()
+            removed += 1
+        except OSError:
+            pass
+        total -= size
+    if removed:
+        print(f"[INFO] Purged {removed} files from {directory}")
+    return removed
@@ -0,0 +1,148 @@
+"""Columnar OCR Text Blocks with Arrow/Parquet export"""
+import numpy as np
+
+# Box column names in the pandas export (Arrow keeps one fixed-size list column)
+BOX_COLUMNS = ('x1', 'y1', 'x2', 'y2')
+
+
+class TextBlocks:
+    """Columnar OCR results: text, confidence, box, page and pass columns
+
+    Text is held Arrow-style as one UTF-8 buffer plus int32 offsets (the
+    decoded strings are kept alongside for Python-side matching), the other
+    columns as NumPy arrays, so stats are vectorized and export to Arrow
+    wraps the buffers without copying. Iterating or indexing still
+    yields {'text', 'confidence', 'box', 'page', 'pass'} dicts, so code
+    written against the old list-of-dicts keeps working.
+    """
+
+    def __init__(self, texts=(), confidence=(), boxes=None, pages=None, passes=None):
+        texts = list(texts)
+        encoded = [t.encode('utf-8') for t in texts]
+        n = len(encoded)
+
+        self._data = b''.join(encoded)
+        self._offsets = np.zeros(n + 1, dtype=np.int32)
+        if n:
+            self._offsets[1:] = np.cumsum([len(e) for e in encoded])
+        self._texts = texts
+
+        self.confidence = np.asarray(confidence, dtype=np.float32).reshape(n)
+        self.boxes = (np.zeros((n, 4), dtype=np.float32) if boxes is None
+                      else np.asarray(boxes, dtype=np.float32).reshape(n, 4))
+        self.pages = np.zeros(n, dtype=np.int16) if pages is None else np.asarray(pages, dtype=np.int16).reshape(n)
+        self.passes = np.zeros(n, dtype=np.int8) if passes is None else np.asarray(passes, dtype=np.int8).reshape(n)
+        self._joined = {}
+
+    @classmethod
+    def from_easyocr(cls, results, min_conf, page=0, pass_number=0):
+        """Build from reader.readtext(detail=1) output, keeping non-empty text above min_conf"""
+        texts, confs, boxes = [], [], []
+        for item in results:
+            if len(item) >= 2:
+                text = item[1].strip()
+                conf = item[2] if len(item) > 2 else 0.9
+                if len(text) > 0 and conf > min_conf:
+                    points = np.asarray(item[0], dtype=np.float32)
+                    texts.append(text)
+                    confs.append(conf)
+                    boxes.append((points[:, 0].min(), points[:, 1].min(), points[:, 0].max(), points[:, 1].max()))
+        n = len(texts)
+        return cls(texts, confs, boxes if n else None,
+                   np.full(n, page, dtype=np.int16), np.full(n, pass_number, dtype=np.int8))
+
+    @classmethod
+    def concat(cls, parts):
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls()
+        return cls([t for p in parts for t in p.texts],
+                   np.concatenate([p.confidence for p in parts]),
+                   np.concatenate([p.boxes for p in parts]),
+                   np.concatenate([p.pages for p in parts]),
+                   np.concatenate([p.passes for p in parts]))
+
+    @property
+    def texts(self):
+        return self._texts
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._row(i)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.take(np.arange(len(self))[index])
+        return self._row(range(len(self))[index])
+
+    def _row(self, i):
+        return {
+            'text': self.texts[i],
+            'confidence': float(self.confidence[i]),
+            'box': self.boxes[i].tolist(),
+            'page': int(self.pages[i]),
+            'pass': int(self.passes[i])
+        }
+
+    def take(self, indices):
+        """New TextBlocks with the rows at indices (or a boolean mask)"""
+        indices = np.arange(len(self))[np.asarray(indices)]
+        texts = self.texts
+        return TextBlocks([texts[i] for i in indices], self.confidence[indices], self.boxes[indices],
+                          self.pages[indices], self.passes[indices])
+
+    def joined(self, lower=False):
+        """All text joined with spaces (cached)"""
+        if lower not in self._joined:
+            text = ' '.join(self.texts)
+            self._joined[lower] = text.lower() if lower else text
+        return self._joined[lower]
+
+    def mean_confidence(self):
+        return float(self.confidence.mean()) if len(self) else 0.0
+
+    def stats(self):
+        """Vectorized summary statistics"""
+        if not len(self):
+            return {'count': 0}
+        return {
+            'count': len(self),
+            'mean_confidence': float(self.confidence.mean()),
+            'min_confidence': float(self.confidence.min()),
+            'p50_confidence': float(np.median(self.confidence)),
+            'pages': int(np.unique(self.pages).size),
+            'chars': len(self._data),
+        }
+
+    def to_arrow(self):
+        """Arrow table - the text and numeric buffers are wrapped, not copied"""
+        import pyarrow as pa
+
+        n = len(self)
+        text = pa.Array.from_buffers(pa.string(), n, [None, pa.py_buffer(self._offsets), pa.py_buffer(self._data)])
+        boxes = pa.FixedSizeListArray.from_arrays(pa.array(np.ascontiguousarray(self.boxes).ravel()), 4)
+        return pa.table({
+            'text': text,
+            'confidence': pa.array(self.confidence),
+            'box': boxes,
+            'page': pa.array(self.pages),
+            'pass': pa.array(self.passes)
+        })
+
+    def to_parquet(self, path):
+        """Write Parquet to a path or a writable binary file object (e.g. io.BytesIO)"""
+        import pyarrow.parquet as pq
+        pq.write_table(self.to_arrow(), path if hasattr(path, 'write') else str(path))
+
+    def to_pandas(self):
+        import pandas as pd
+
+        data = {'text': self.texts, 'confidence': self.confidence}
+        for j, name in enumerate(BOX_COLUMNS):
+            data[name] = self.boxes[:, j]
+        data['page'] = self.pages
+        data['pass'] = self.passes
+        return pd.DataFrame(data)
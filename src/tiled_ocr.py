@@ -0,0 +1,129 @@
+"""Tiled, Parallel OCR for very large scans"""
+import cv2
+import numpy as np
+
+import profiler
+from prompt_builder import normalize_text
+
+
+class TiledOCR:
+    """Split large images into overlapping tiles, OCR them on a worker pool, merge the boxes
+
+    Tile size follows the estimated text height (tiles hold a few dozen
+    lines). Vertical overlap is two line heights; horizontal overlap is the
+    widest detected line plus a margin, so every line appears whole in at
+    least one tile. When lines are too wide for that (over half a tile) the
+    image is cut into full-width horizontal bands instead. Tiles are spaced
+    evenly, so the slack is spread over all overlaps instead of adding a
+    sliver tile. Fragments cut at a seam are dropped in favour of the whole
+    line from the neighbouring tile.
+    """
+
+    def __init__(self, executor, min_side=3000, probe_side=1280,
+                 min_tile=1024, max_tile=2560, iou_threshold=0.5):
+        self.executor = executor
+        self.min_side = min_side
+        self.probe_side = probe_side
+        self.min_tile = min_tile
+        self.max_tile = max_tile
+        self.iou_threshold = iou_threshold
+
+    def should_tile(self, img):
+        return max(img.shape[:2]) >= self.min_side
+
+    def estimate_text_size(self, reader, img):
+        """(median text-box height, widest text line), from CRAFT detection on a downscaled copy"""
+        h, w = img.shape[:2]
+        scale = min(1.0, self.probe_side / float(max(h, w)))
+        small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        horizontal, _ = reader.detect(small)
+        boxes = horizontal[0] if horizontal else []
+        if not boxes:
+            return 32.0, float(w)
+        heights = [b[3] - b[2] for b in boxes]
+        widths = [b[1] - b[0] for b in boxes]
+        return max(float(np.median(heights)) / scale, 8.0), max(widths) / scale
+
+    def plan_tiles(self, shape, text_height, line_width):
+        """Return [(x, y, w, h)] tiles covering the image with overlap"""
+        h, w = shape[:2]
+        tile = int(np.clip(text_height * 48, self.min_tile, self.max_tile))
+        y_overlap = int(np.clip(text_height * 2, 32, tile // 4))
+        x_overlap = int(line_width + text_height * 2)
+
+        def starts(length, overlap):
+            # Fewest tiles whose overlap is at least `overlap`, spaced evenly
+            if length <= tile:
+                return [0]
+            n = int(np.ceil((length - overlap) / float(tile - overlap)))
+            return [int(round(i * (length - tile) / float(n - 1))) for i in range(n)]
+
+        if x_overlap > tile // 2:
+            # Lines too wide to overlap horizontally - full-width bands
+            return [(0, y, w, min(tile, h - y)) for y in starts(h, y_overlap)]
+        return [(x, y, min(tile, w - x), min(tile, h - y))
+                for y in starts(h, y_overlap) for x in starts(w, x_overlap)]
+
+    def readtext(self, reader, img, **ocr_kwargs):
+        """reader.readtext-compatible results for the whole image (ocr_kwargs go to every tile)"""
+        text_height, line_width = self.estimate_text_size(reader, img)
+        tiles = self.plan_tiles(img.shape, text_height, line_width)
+        print(f"[INFO] Tiled OCR: {len(tiles)} tiles (text height ~{text_height:.0f}px, "
+              f"widest line ~{line_width:.0f}px)")
+
+        # bind() attributes the tiles to this request when it is being profiled
+        read = profiler.bind(reader.readtext)
+        futures = [self.executor.submit(read, img[y:y + th, x:x + tw], detail=1, **ocr_kwargs)
+                   for x, y, tw, th in tiles]
+
+        candidates = []
+        for (x, y, tw, th), future in zip(tiles, futures):
+            for points, text, conf in future.result():
+                points = np.asarray(points, dtype=np.float32) + (x, y)
+                box = (points[:, 0].min(), points[:, 1].min(), points[:, 0].max(), points[:, 1].max())
+                # Boxes touching an inner tile border are probably cut off
+                cut = ((box[0] - x < 2 and x > 0) or (box[1] - y < 2 and y > 0) or
+                       (x + tw - box[2] < 2 and x + tw < img.shape[1]) or
+                       (y + th - box[3] < 2 and y + th < img.shape[0]))
+                candidates.append((cut, -conf, box, points.tolist(), text, conf))
+
+        return self._merge(candidates)
+
+    def _merge(self, candidates):
+        """Box-level NMS plus text deduplication across tile overlaps
+        
+        A cut box mostly inside a kept box is a fragment of that line and is
+        dropped even when its (partial) text differs.
+        """
+        # Whole boxes before cut ones, then by confidence
+        candidates.sort(key=lambda c: (c[0], c[1]))
+        kept = []
+        for cut, _, box, points, text, conf in candidates:
+            key = normalize_text(text)
+            duplicate = False
+            for kbox, _, ktext, _, kkey in kept:
+                overlap = self._overlap(box, kbox)
+                if overlap['iou'] >= self.iou_threshold:
+                    duplicate = True
+                elif overlap['containment'] >= 0.8 and (cut or key in kkey or kkey in key):
+                    duplicate = True
+                if duplicate:
+                    break
+            if not duplicate:
+                kept.append((box, points, text, conf, key))
+
+        # Restore reading order: top-to-bottom, then left-to-right
+        kept.sort(key=lambda k: (round(k[0][1] / 10.0), k[0][0]))
+        return [(points, text, conf) for _, points, text, conf, _ in kept]
+
+    def _overlap(self, a, b):
+        ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+        iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+        inter = ix * iy
+        area_a = (a[2] - a[0]) * (a[3] - a[1])
+        area_b = (b[2] - b[0]) * (b[3] - b[1])
+        union = area_a + area_b - inter
+        return {
+            'iou': inter / union if union > 0 else 0.0,
+            'containment': inter / min(area_a, area_b) if min(area_a, area_b) > 0 else 0.0
+        }
@@ -0,0 +1,140 @@
+"""Persistent Visa Requirements Store with background refresh"""
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+def normalize_corridor(from_country, to_country, purpose):
+    """Case/whitespace-insensitive key for a (from, to, purpose) corridor"""
+    return tuple(' '.join(str(v).split()).casefold() for v in (from_country, to_country, purpose))
+
+
+class VisaRequirementsStore:
+    """SQLite store of requirement answers keyed by corridor, plus a lookup log"""
+
+    def __init__(self, path='outputs/visa_requirements.db', max_age_hours=24 * 7):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_age = max_age_hours * 3600
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS requirements (
+                    from_country TEXT, to_country TEXT, purpose TEXT,
+                    answer TEXT NOT NULL, source TEXT, updated_at REAL NOT NULL,
+                    PRIMARY KEY (from_country, to_country, purpose)
+                );
+                CREATE INDEX IF NOT EXISTS idx_requirements_updated ON requirements(updated_at);
+                CREATE TABLE IF NOT EXISTS lookups (
+                    from_country TEXT, to_country TEXT, purpose TEXT, at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_lookups_at ON lookups(at);
+            """)
+
+    def get(self, from_country, to_country, purpose):
+        """Return {'answer', 'source', 'updated_at', 'age_seconds', 'stale'} or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT answer, source, updated_at FROM requirements "
+                "WHERE from_country=? AND to_country=? AND purpose=?",
+                normalize_corridor(from_country, to_country, purpose)
+            ).fetchone()
+        if row is None:
+            return None
+        age = time.time() - row[2]
+        return {'answer': row[0], 'source': row[1], 'updated_at': row[2],
+                'age_seconds': age, 'stale': age > self.max_age}
+
+    def put(self, from_country, to_country, purpose, answer, source=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO requirements VALUES (?, ?, ?, ?, ?, ?)",
+                normalize_corridor(from_country, to_country, purpose) + (answer, source, time.time())
+            )
+
+    def log_lookup(self, from_country, to_country, purpose):
+        """Record a user lookup (as typed) - the pre-warming job derives popular corridors from these"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO lookups VALUES (?, ?, ?, ?)",
+                tuple(' '.join(str(v).split()) for v in (from_country, to_country, purpose)) + (time.time(),)
+            )
+
+    def popular_corridors(self, limit=50, since_days=30):
+        """Most looked-up corridors over the last since_days, in their display form
+
+        Lookups are grouped by normalize_corridor; each group is returned as
+        its most common spelling, preferring capitalized ones (older logs
+        stored casefolded names).
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT from_country, to_country, purpose, COUNT(*) FROM lookups WHERE at >= ? "
+                "GROUP BY from_country, to_country, purpose",
+                (time.time() - since_days * 86400,)
+            ).fetchall()
+
+        totals, display = {}, {}
+        for from_country, to_country, purpose, count in rows:
+            corridor = (from_country, to_country, purpose)
+            key = normalize_corridor(*corridor)
+            totals[key] = totals.get(key, 0) + count
+            rank = (any(not v.islower() for v in corridor), count)
+            if key not in display or rank > display[key][0]:
+                display[key] = (rank, corridor)
+        ranked = sorted(totals, key=totals.get, reverse=True)[:limit]
+        return [display[key][1] for key in ranked]
+
+    def needs_refresh(self, from_country, to_country, purpose):
+        record = self.get(from_country, to_country, purpose)
+        return record is None or record['stale']
+
+
+class BackgroundRefresher:
+    """Fill and refresh the store on a bounded worker pool without blocking callers"""
+
+    def __init__(self, store, assistant_factory, max_workers=4):
+        self.store = store
+        self.assistant_factory = assistant_factory
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='visa-prewarm')
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def refresh(self, from_country, to_country, purpose):
+        """Schedule a refresh; returns the future, or None if one is already running"""
+        key = normalize_corridor(from_country, to_country, purpose)
+        with self._lock:
+            if key in self._in_flight:
+                return None
+            self._in_flight.add(key)
+        return self.executor.submit(self._refresh, key, from_country, to_country, purpose)
+
+    def prewarm(self, corridors, force=False):
+        """Schedule every missing or stale corridor; returns the list of futures"""
+        futures = []
+        for from_country, to_country, purpose in corridors:
+            if force or self.store.needs_refresh(from_country, to_country, purpose):
+                future = self.refresh(from_country, to_country, purpose)
+                if future is not None:
+                    futures.append(future)
+        return futures
+
+    def _refresh(self, key, from_country, to_country, purpose):
+        try:
+            # One assistant per worker thread
+            if not hasattr(self._local, 'assistant'):
+                self._local.assistant = self.assistant_factory()
+            assistant = self._local.assistant
+            answer = assistant.get_visa_requirements(from_country, to_country, purpose)
+            self.store.put(from_country, to_country, purpose, answer, assistant.backend.name)
+            print(f"[SUCCESS] Refreshed visa requirements: {from_country} → {to_country} ({purpose})")
+            return True
+        except Exception as e:
+            print(f"[ERROR] Refresh failed for {from_country} → {to_country} ({purpose}): {e}")
+            return False
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)